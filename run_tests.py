@@ -1,9 +1,11 @@
 #!/usr/bin/env python
 """Comprehensive test runner for MSSQL MCP Server."""
 
+import os
 import sys
 import subprocess
 import argparse
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
 def run_command(cmd, description):
@@ -20,12 +22,56 @@ def run_command(cmd, description):
     print(f"✅ {description} passed")
     return True
 
+def run_commands_parallel(commands):
+    """Run independent commands concurrently and handle their output.
+
+    Takes a list of (cmd, description) pairs. Output is captured and printed
+    as each command finishes. Returns a dict mapping description to success.
+    """
+    results = {}
+    with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+        futures = {
+            executor.submit(subprocess.run, cmd, capture_output=True, text=True): (cmd, description)
+            for cmd, description in commands
+        }
+        for future in as_completed(futures):
+            cmd, description = futures[future]
+            result = future.result()
+            print(f"\n{'='*60}")
+            print(f"Ran: {description}")
+            print(f"Command: {' '.join(cmd)}")
+            print('='*60)
+            sys.stdout.write(result.stdout)
+            sys.stderr.write(result.stderr)
+
+            if result.returncode != 0:
+                print(f"❌ {description} failed with return code {result.returncode}")
+                results[description] = False
+            else:
+                print(f"✅ {description} passed")
+                results[description] = True
+    return results
+
+def exec_command(cmd, description):
+    """Replace the current process with a command.
+
+    Used when a suite consists of a single command, so no summary is needed
+    and running it as a child process would only add another interpreter.
+    """
+    print(f"\n{'='*60}")
+    print(f"Running: {description}")
+    print(f"Command: {' '.join(cmd)}")
+    print('='*60)
+    sys.stdout.flush()
+    os.execvp(cmd[0], cmd)
+
 def main():
     parser = argparse.ArgumentParser(description="Run MSSQL MCP Server tests")
     parser.add_argument('--suite', choices=['all', 'unit', 'security', 'integration', 'performance', 'quality'],
                         default='all', help='Test suite to run')
     parser.add_argument('--coverage', action='store_true', help='Generate coverage report')
-    parser.add_argument('--parallel', action='store_true', help='Run tests in parallel')
+    parser.add_argument('--parallel', action=argparse.BooleanOptionalAction, default=True,
+                        help='Run tests in parallel with pytest-xdist (default: on)')
     parser.add_argument('--verbose', '-v', action='store_true', help='Verbose output')
     
     args = parser.parse_args()
@@ -34,10 +80,26 @@ def main():
     pytest_cmd = ['pytest']
     if args.verbose:
         pytest_cmd.append('-v')
-    if args.parallel:
-        pytest_cmd.extend(['-n', 'auto'])
     if args.coverage:
-        pytest_cmd.extend(['--cov=src/mssql_mcp_server', '--cov-report=html', '--cov-report=term'])
+        pytest_cmd.extend(['--cov=src/yulin_mssql_mcp', '--cov-report=html', '--cov-report=term'])
+    # pytest-benchmark does not time benchmarks on xdist workers
+    benchmark_cmd = pytest_cmd + ['--benchmark-only']
+    if args.parallel:
+        # Tests marked with the same xdist_group run on the same worker
+        pytest_cmd = pytest_cmd + ['-n', 'auto', '--dist=loadgroup']
+    
+    # Suites that run a single pytest command
+    pytest_suites = {
+        'unit': (['tests/test_config.py', 'tests/test_server.py'], "Unit tests"),
+        'integration': (['tests/test_integration.py', 'tests/test_error_handling.py'],
+                        "Integration tests"),
+        'performance': (['tests/test_performance.py', '-s'], "Performance tests"),
+    }
+    # On Windows exec does not replace the process, so keep using subprocess there
+    if args.suite in pytest_suites and os.name == 'posix':
+        test_args, description = pytest_suites[args.suite]
+        base_cmd = benchmark_cmd if args.suite == 'performance' else pytest_cmd
+        exec_command(base_cmd + test_args, description)
     
     success = True
     
@@ -45,20 +107,19 @@ def main():
         # Code quality checks
         print("\n🔍 Running code quality checks...")
         
-        if not run_command(['black', '--check', 'src', 'tests'], "Black formatting check"):
-            success = False
-        
-        if not run_command(['ruff', 'check', 'src', 'tests'], "Ruff linting"):
-            success = False
-        
-        if not run_command(['mypy', 'src', '--ignore-missing-imports'], "MyPy type checking"):
+        results = run_commands_parallel([
+            (['black', '--check', 'src', 'tests'], "Black formatting check"),
+            (['ruff', 'check', 'src', 'tests'], "Ruff linting"),
+            (['mypy', 'src', '--ignore-missing-imports'], "MyPy type checking"),
+        ])
+        if not all(results.values()):
             success = False
     
     if args.suite in ['all', 'unit']:
         # Unit tests
         print("\n🧪 Running unit tests...")
-        cmd = pytest_cmd + ['tests/test_config.py', 'tests/test_server.py']
-        if not run_command(cmd, "Unit tests"):
+        test_args, description = pytest_suites['unit']
+        if not run_command(pytest_cmd + test_args, description):
             success = False
     
     if args.suite in ['all', 'security']:
@@ -70,25 +131,29 @@ def main():
         
         # Run security scanning
         print("\n🔍 Running security scans...")
-        if not run_command(['safety', 'check'], "Safety dependency check"):
+        results = run_commands_parallel([
+            (['safety', 'check'], "Safety dependency check"),
+            (['bandit', '-r', 'src', '-f', 'json', '-o', 'bandit-report.json'],
+             "Bandit security scan"),
+        ])
+        if not results["Safety dependency check"]:
             print("⚠️  Security vulnerabilities found in dependencies")
         
-        if not run_command(['bandit', '-r', 'src', '-f', 'json', '-o', 'bandit-report.json'], 
-                          "Bandit security scan"):
+        if not results["Bandit security scan"]:
             print("⚠️  Security issues found in code")
     
     if args.suite in ['all', 'integration']:
         # Integration tests
         print("\n🔗 Running integration tests...")
-        cmd = pytest_cmd + ['tests/test_integration.py', 'tests/test_error_handling.py']
-        if not run_command(cmd, "Integration tests"):
+        test_args, description = pytest_suites['integration']
+        if not run_command(pytest_cmd + test_args, description):
             success = False
     
     if args.suite in ['all', 'performance']:
         # Performance tests
         print("\n⚡ Running performance tests...")
-        cmd = pytest_cmd + ['tests/test_performance.py', '-s']
-        if not run_command(cmd, "Performance tests"):
+        test_args, description = pytest_suites['performance']
+        if not run_command(benchmark_cmd + test_args, description):
             success = False
     
     # Summary
@@ -1,11 +1,9 @@
-import asyncio
-
 from . import server
 
 
 def main():
     """Main entry point for the package."""
-    asyncio.run(server.main())
+    server.run()
 
 
 # Expose important items at package level
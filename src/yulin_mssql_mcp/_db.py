@@ -0,0 +1,132 @@
+"""Database driver selection.
+
+The server talks to SQL Server through a DB-API 2.0 driver chosen with the
+MSSQL_DRIVER environment variable. pymssql is the default and always
+installed; pyodbc and mssql-python are optional extras. Drivers are only
+imported on first use, so starting the server and answering tools/list
+does not pay for loading a C extension and its native libraries.
+"""
+
+import functools
+import importlib
+import importlib.util
+import os
+
+DEFAULT_DRIVER = "pymssql"
+DEFAULT_ODBC_DRIVER = "ODBC Driver 18 for SQL Server"
+
+# Server configuration keys only the ODBC drivers understand
+_ODBC_ONLY_SETTINGS = frozenset({"encrypt", "trust_server_certificate"})
+
+# MSSQL_DRIVER value -> (module name, package extra)
+_DRIVERS = {
+    "pymssql": ("pymssql", None),
+    "pyodbc": ("pyodbc", "pyodbc"),
+    "mssql_python": ("mssql_python", "mssql-python"),
+}
+
+
+@functools.cache
+def get_driver():
+    """Get the configured driver name."""
+    name = os.getenv("MSSQL_DRIVER", DEFAULT_DRIVER).strip().lower()
+    if name not in _DRIVERS:
+        raise ValueError(
+            f"Unsupported MSSQL_DRIVER: {name}. Choose one of: {', '.join(_DRIVERS)}"
+        )
+    return name
+
+
+def module():
+    """Get the DB-API module of the configured driver."""
+    return _import_driver(get_driver())
+
+
+class _DriverUnavailable(Exception):
+    """Stands in for the error classes of a driver that cannot be imported."""
+
+
+def error_classes():
+    """Get the configured driver's DatabaseError and OperationalError classes."""
+    # A driver that is not installed raises nothing, so a stand-in is returned
+    # and the ImportError surfaces where a connection is opened
+    try:
+        driver = module()
+    except ImportError:
+        return _DriverUnavailable, _DriverUnavailable
+    return driver.DatabaseError, driver.OperationalError
+
+
+def check_driver():
+    """Check that the configured driver is installed, without importing it."""
+    name = get_driver()
+    module_name, _ = _DRIVERS[name]
+    if importlib.util.find_spec(module_name) is None:
+        raise ImportError(_missing_driver_message(name))
+
+
+def _missing_driver_message(name):
+    """Describe how to install a missing driver."""
+    module_name, extra = _DRIVERS[name]
+    package = f"'yulin-mssql-mcp[{extra}]'" if extra else module_name
+    return (
+        f"MSSQL_DRIVER={name} requires the {module_name} package: "
+        f"pip install {package}"
+    )
+
+
+@functools.cache
+def _import_driver(name):
+    """Import a driver, explaining how to install it if missing."""
+    module_name, _ = _DRIVERS[name]
+    try:
+        return importlib.import_module(module_name)
+    except ImportError as e:
+        raise ImportError(_missing_driver_message(name)) from e
+
+
+def _odbc_value(value):
+    """Quote a value for an ODBC connection string."""
+    return "{" + str(value).replace("}", "}}") + "}"
+
+
+def odbc_connection_string(config, odbc_driver=None):
+    """Build an ODBC-style connection string from the server configuration."""
+    server = config["server"]
+    if "port" in config:
+        server = f"{server},{config['port']}"
+    parts = [
+        f"SERVER={_odbc_value(server)}",
+        f"DATABASE={_odbc_value(config['database'])}",
+    ]
+    if odbc_driver:
+        parts.insert(0, f"DRIVER={_odbc_value(odbc_driver)}")
+    if "user" in config:
+        parts.append(f"UID={_odbc_value(config['user'])}")
+        parts.append(f"PWD={_odbc_value(config['password'])}")
+    else:
+        # Windows Authentication
+        parts.append("Trusted_Connection=yes")
+    # ODBC Driver 18 encrypts by default, which fails against servers with
+    # self-signed certificates unless encryption was asked for explicitly
+    parts.append("Encrypt=yes" if config.get("encrypt") else "Encrypt=no")
+    if config.get("trust_server_certificate"):
+        parts.append("TrustServerCertificate=yes")
+    return ";".join(parts)
+
+
+def connector(config):
+    """Build a zero-argument function that opens connections for a config."""
+    name = get_driver()
+    driver = _import_driver(name)
+    if name == "pymssql":
+        kwargs = {k: v for k, v in config.items() if k not in _ODBC_ONLY_SETTINGS}
+        return functools.partial(driver.connect, **kwargs)
+    if name == "pyodbc":
+        conn_str = odbc_connection_string(
+            config, os.getenv("MSSQL_ODBC_DRIVER", DEFAULT_ODBC_DRIVER)
+        )
+    else:
+        # mssql-python bundles its own driver and rejects the DRIVER key
+        conn_str = odbc_connection_string(config)
+    return functools.partial(driver.connect, conn_str)
@@ -1,17 +1,36 @@
 import asyncio
+import contextvars
+import csv
+import functools
+import io
 import logging
 import os
 import re
 import sys
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, closing
+from urllib.parse import urlsplit
 
-import pymssql
 from mcp.server import Server
 from mcp.types import Resource, TextContent, Tool
 from pydantic import AnyUrl
 
+from . import _db
+
+# Values accepted as "on" for boolean environment settings
+_TRUE_VALUES = frozenset({"1", "true", "yes", "on"})
+
+
+def _get_bool(name):
+    """Read a boolean setting from the environment (unset means False)."""
+    return os.getenv(name, "").strip().lower() in _TRUE_VALUES
+
+
 # Configure logging - MUST output to stderr for MCP stdio transport
 # Debug mode can be enabled via MCP_DEBUG environment variable
-debug_mode = os.getenv("MCP_DEBUG", "0") == "1"
+debug_mode = _get_bool("MCP_DEBUG")
 log_level = logging.DEBUG if debug_mode else logging.INFO
 
 logging.basicConfig(
@@ -25,66 +44,125 @@ if debug_mode:
     logger.debug("Debug mode enabled via MCP_DEBUG environment variable")
 
 
+# Allow only alphanumeric, underscore, and dot (for schema.table)
+_TABLE_NAME_RE = re.compile(r"[A-Za-z0-9_]+(?:\.[A-Za-z0-9_]+)?")
+
+
 def validate_table_name(table_name: str) -> str:
     """Validate and escape table name to prevent SQL injection."""
-    # Allow only alphanumeric, underscore, and dot (for schema.table)
-    if not re.match(r"^[a-zA-Z0-9_]+(\.[a-zA-Z0-9_]+)?$", table_name):
+    if not _TABLE_NAME_RE.fullmatch(table_name):
         raise ValueError(f"Invalid table name: {table_name}")
 
     # Split schema and table if present
-    parts = table_name.split(".")
-    if len(parts) == 2:
+    schema, dot, table = table_name.partition(".")
+    if dot:
         # Escape both schema and table name
-        return f"[{parts[0]}].[{parts[1]}]"
+        return f"[{schema}].[{table}]"
     else:
         # Just table name
         return f"[{table_name}]"
 
 
+def fetch_batches(cursor, max_rows=None):
+    """Yield result rows from a cursor in batches, stopping after max_rows."""
+    # Only one batch is held in memory, and rows past max_rows are never
+    # fetched, so they are still unread on the cursor afterwards
+    remaining = max_rows
+    while remaining is None or remaining > 0:
+        if remaining is None:
+            batch = cursor.fetchmany()
+        else:
+            batch = cursor.fetchmany(min(cursor.arraysize, remaining))
+        if not batch:
+            return
+        if remaining is not None:
+            batch = batch[:remaining]
+            remaining -= len(batch)
+        yield batch
+
+
+def format_csv(columns, batches):
+    """Format batches of rows as CSV text, returning it and the row count."""
+    # NULLs are written as NULL; values with commas, quotes or newlines are
+    # quoted so every row stays parseable
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator="\n")
+    writer.writerow(columns)
+    row_count = 0
+    for batch in batches:
+        # Most rows contain no NULLs; the C-level containment check lets
+        # those go to the writer untouched instead of being rebuilt per cell
+        writer.writerows(
+            (
+                ["NULL" if value is None else value for value in row]
+                if None in row
+                else row
+            )
+            for row in batch
+        )
+        row_count += len(batch)
+    # Drop the line terminator after the last row
+    return buf.getvalue()[:-1], row_count
+
+
+# Server name markers recognised by get_db_config (compared lowercased)
+_LOCALDB_PREFIX = "(localdb)\\"
+_AZURE_SQL_SUFFIX = ".database.windows.net"
+
+
+@functools.cache
 def get_db_config():
     """Get database configuration from environment variables."""
+    # Read once and returned read-only, so callers cannot change it for each other
     # Basic configuration
     server = os.getenv("MSSQL_SERVER", "localhost")
-    logger.info(
-        f"MSSQL_SERVER environment variable: {os.getenv('MSSQL_SERVER', 'NOT SET')}"
+    logger.debug(
+        "MSSQL_SERVER environment variable: %s", os.getenv("MSSQL_SERVER", "NOT SET")
     )
-    logger.info(f"Using server: {server}")
+    logger.info("Using server: %s", server)
+
+    # Server names are case-insensitive; lowercase once for the checks below
+    server_lower = server.lower()
 
     # Handle LocalDB connections (Issue #6)
-    # LocalDB format: (localdb)\instancename
-    if server.startswith("(localdb)\\"):
+    # LocalDB format: (localdb)\instancename, which the ODBC drivers accept
+    if server_lower.startswith(_LOCALDB_PREFIX) and _db.get_driver() == "pymssql":
         # For LocalDB, pymssql needs special formatting
         # Convert (localdb)\MSSQLLocalDB to localhost\MSSQLLocalDB with dynamic port
-        instance_name = server.replace("(localdb)\\", "")
+        instance_name = server[len(_LOCALDB_PREFIX) :]
         server = f".\\{instance_name}"
-        logger.info(f"Detected LocalDB connection, converted to: {server}")
+        logger.info("Detected LocalDB connection, converted to: %s", server)
 
     config = {
         "server": server,
         "user": os.getenv("MSSQL_USER"),
         "password": os.getenv("MSSQL_PASSWORD"),
         "database": os.getenv("MSSQL_DATABASE"),
-        "port": os.getenv("MSSQL_PORT", "1433"),  # Default MSSQL port
     }
-    # Port support (Issue #8)
+    # Port support (Issue #8); without a valid port the driver uses 1433
     port = os.getenv("MSSQL_PORT")
     if port:
         try:
             config["port"] = int(port)
         except ValueError:
-            logger.warning(f"Invalid MSSQL_PORT value: {port}. Using default port.")
+            logger.warning("Invalid MSSQL_PORT value: %s. Using default port.", port)
 
     # TDS version settings for Azure SQL (Issue #11)
-    # Check if we're connecting to Azure SQL
-    if config["server"] and ".database.windows.net" in config["server"]:
+    # Check if we're connecting to Azure SQL (hostnames end with the suffix)
+    if server_lower.endswith(_AZURE_SQL_SUFFIX):
         config["tds_version"] = "7.4"  # Required for Azure SQL
         logger.info("Detected Azure SQL connection, using TDS version 7.4")
 
-    # Note: pymssql doesn't support encrypt parameter directly
-    # For encryption, you need to configure it at the server level or use other drivers
+    # Encryption settings; Azure SQL only accepts encrypted connections.
+    # Note: pymssql doesn't support these directly, they are applied by the
+    # ODBC drivers. For pymssql, configure encryption in freetds.conf.
+    config["encrypt"] = server_lower.endswith(_AZURE_SQL_SUFFIX) or _get_bool(
+        "MSSQL_ENCRYPT"
+    )
+    config["trust_server_certificate"] = _get_bool("MSSQL_TRUST_SERVER_CERTIFICATE")
 
     # Windows Authentication support (Issue #7)
-    use_windows_auth = os.getenv("MSSQL_WINDOWS_AUTH", "false").lower() == "true"
+    use_windows_auth = _get_bool("MSSQL_WINDOWS_AUTH")
 
     if use_windows_auth:
         # For Windows authentication, user and password are not required
@@ -99,30 +177,326 @@ def get_db_config():
         # SQL Authentication - user and password are required
         if not all([config["user"], config["password"], config["database"]]):
             logger.error(
-                "Missing required database configuration. Please check environment variables:"
+                "Missing required database configuration. "
+                "Please check environment variables:"
             )
             logger.error("MSSQL_USER, MSSQL_PASSWORD, and MSSQL_DATABASE are required")
             raise ValueError("Missing required database configuration")
 
-    return config
+    return types.MappingProxyType(config)
 
 
+@functools.cache
 def get_command():
     """Get the command to execute SQL queries."""
     return os.getenv("MSSQL_COMMAND", "execute_sql")
 
 
-# Initialize server
-app = Server("mssql_mcp_server")
+def _get_positive_int(name, default):
+    """Read a positive integer setting from the environment."""
+    value = os.getenv(name)
+    if value:
+        try:
+            if int(value) > 0:
+                return int(value)
+        except ValueError:
+            pass
+        logger.warning("Invalid %s value: %s. Using default.", name, value)
+    return default
+
+
+DEFAULT_RESOURCE_CACHE_TTL = 30
+
+# The start of a string literal, quoted identifier or comment. Removing
+# those leaves only the statement structure (see _sql_structure).
+_SQL_OPAQUE_START_RE = re.compile(r"['\"\[]|--|/\*")
+# The rest of each token after its opening characters; block comments nest,
+# so they are matched by counting delimiters instead
+_SQL_OPAQUE_END_RES = {
+    "'": re.compile(r"[^']*(?:''[^']*)*'"),
+    '"': re.compile(r'[^"]*(?:""[^"]*)*"'),
+    "[": re.compile(r"[^\]]*(?:\]\][^\]]*)*\]"),
+    "--": re.compile(r"[^\n]*"),
+}
+_SQL_COMMENT_DELIM_RE = re.compile(r"/\*|\*/")
+_SQL_UNTERMINATED = {
+    "'": "unterminated string literal",
+    '"': "unterminated quoted identifier",
+    "[": "unterminated quoted identifier",
+    "/*": "unterminated comment",
+}
+
+# Queries that may add, remove or rename tables. Matching is deliberately
+# loose: a false positive only costs one extra catalog query.
+_SCHEMA_CHANGE_RE = re.compile(
+    r"\b(?:CREATE|DROP|ALTER)\b|\bsp_rename\b|\bSELECT\b[^;]*\bINTO\b",
+    re.IGNORECASE,
+)
 
+# Queries that may change session state which outlives the request: the
+# current database, SET options, temporary tables, impersonation and
+# application roles, session context, opened keys and (global by default)
+# cursors. Their connection is closed instead of pooled. Matching is loose
+# here too; only assignments (UPDATE ... SET col = ..., SET @var = ...) are
+# left out.
+_SESSION_CHANGE_RE = re.compile(
+    r"\bUSE\b|\bSET\s+(?![\w@.\[\]\"]+\s*[-+*/%&|^]?=)|#"
+    r"|\bEXEC(?:UTE)?\s+AS\b|\bSETUSER\b|\bsp_setapprole\b|\bsp_set_session_context\b"
+    r"|\bOPEN\s+(?:SYMMETRIC|MASTER)\s+KEY\b|\bDECLARE\s+\w+\s+(?:\w+\s+)*CURSOR\b",
+    re.IGNORECASE,
+)
 
-@app.list_resources()
-async def list_resources() -> list[Resource]:
-    """List SQL Server tables as resources."""
-    config = get_db_config()
+# Statements SQL Server only accepts at the start of a batch. Joined to other
+# queries, the ones after them would become part of the object's definition.
+_BATCH_ALONE_RE = re.compile(
+    r"\b(?:CREATE|ALTER)\s+(?:OR\s+ALTER\s+)?(?:PROC|PROCEDURE|VIEW|FUNCTION|TRIGGER)\b"
+    r"|\bCREATE\s+(?:SCHEMA|DEFAULT|RULE)\b",
+    re.IGNORECASE,
+)
+
+
+@functools.cache
+def get_max_rows():
+    """Get the maximum number of rows returned per query (None for no limit)."""
+    return _get_positive_int("MSSQL_MAX_ROWS", None)
+
+
+@functools.cache
+def get_resource_cache_ttl():
+    """Get how many seconds the table list is cached (0 disables caching)."""
+    if os.getenv("MSSQL_RESOURCE_CACHE_TTL", "").strip() == "0":
+        return 0
+    return _get_positive_int("MSSQL_RESOURCE_CACHE_TTL", DEFAULT_RESOURCE_CACHE_TTL)
+
+
+# Number of rows fetched from the server per round-trip
+FETCH_BATCH_SIZE = 1000
+# Number of rows returned when reading a table resource
+RESOURCE_ROW_LIMIT = 100
+
+# Connection pool settings
+DEFAULT_POOL_SIZE = 5
+# Pooled connections idle for longer than this are re-validated before reuse
+POOL_PING_AFTER_SECONDS = 30
+
+# Idle connections as (connection, last_used) pairs, created on first use
+_pool = None
+# Slots for live connections owned by the pool (idle + checked out)
+_pool_slots = None
+# Worker threads for blocking database calls, sized to match the pool
+_executor = None
+# Connection factory as (config, connect), built for the current config
+_connector = None
+# The worker call the current task is waiting for, if it has not finished
+_running_call = contextvars.ContextVar("mssql_running_call", default=None)
+
+
+def get_pool_size():
+    """Get the maximum number of pooled connections."""
+    return _get_positive_int("MSSQL_POOL_SIZE", DEFAULT_POOL_SIZE)
+
+
+def _get_executor():
+    """Get the database worker threads, starting them on first use."""
+    global _executor
+    if _executor is None:
+        # Each call runs for a connection holding a pool slot, so one thread
+        # per pooled connection is enough
+        _executor = ThreadPoolExecutor(
+            max_workers=get_pool_size(), thread_name_prefix="mssql"
+        )
+    return _executor
+
+
+async def _run_blocking(func, *args):
+    """Run a blocking database call in the database worker threads."""
+    call = _get_executor().submit(func, *args)
+    token = _running_call.set(call)
+    try:
+        return await asyncio.wrap_future(call)
+    finally:
+        # A cancelled call keeps running; leave it visible to _close_when_idle
+        if call.done():
+            _running_call.reset(token)
+
+
+def _ping(conn):
+    """Check that an idle connection is still usable."""
     try:
-        conn = pymssql.connect(**config)
-        cursor = conn.cursor()
+        with closing(conn.cursor()) as cursor:
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+        return True
+    except Exception as e:
+        logger.debug("Discarding stale pooled connection: %s", e)
+        return False
+
+
+def _rollback(conn):
+    """Roll back whatever a connection left open before it is reused."""
+    try:
+        conn.rollback()
+        return True
+    except Exception as e:
+        logger.debug("Rollback failed, discarding connection: %s", e)
+        return False
+
+
+def _close_conn(conn):
+    """Close a connection that is leaving the pool."""
+    try:
+        conn.close()
+    except Exception as e:
+        logger.debug("Error closing discarded connection: %s", e)
+
+
+def _close_later(conn):
+    """Close a connection in a worker thread without waiting for it."""
+    _get_executor().submit(_close_conn, conn)
+
+
+def _close_opened(call):
+    """Close the connection a cancelled connect call went on to open."""
+    if not call.cancelled() and call.exception() is None:
+        _close_later(call.result())
+
+
+def _close_when_idle(conn):
+    """Close a connection once the call a cancelled task left on it ends."""
+    # Cancelling does not stop a call already running in a worker thread, and
+    # closing the connection underneath it is not safe
+    call = _running_call.get()
+    if call is None or call.done():
+        _close_later(conn)
+    else:
+        call.add_done_callback(lambda _: _close_later(conn))
+
+
+async def _discard_conn(slots, conn):
+    """Close a connection and give its slot to the next waiting request."""
+    try:
+        await _run_blocking(_close_conn, conn)
+    finally:
+        slots.release()
+
+
+async def _release_conn(pool, slots, conn):
+    """Return a clean connection to the pool it was taken from."""
+    if pool is not _pool:
+        # The pool was closed while this connection was checked out
+        await _discard_conn(slots, conn)
+        return
+    pool.append((conn, time.monotonic()))
+    slots.release()
+
+
+def _get_connector(config):
+    """Get the connection factory for a config, building it on first use."""
+    global _connector
+    if _connector is None or _connector[0] is not config:
+        _connector = (config, _db.connector(config))
+    return _connector[1]
+
+
+async def _take_conn(pool, slots, config):
+    """Take an idle connection from the pool, or open one, once a slot is free."""
+    await slots.acquire()
+    try:
+        while pool:
+            # Take the most recently used connection, the least likely stale
+            conn, last_used = pool.pop()
+            if time.monotonic() - last_used < POOL_PING_AFTER_SECONDS:
+                return conn
+            try:
+                alive = await _run_blocking(_ping, conn)
+            except asyncio.CancelledError:
+                _close_when_idle(conn)
+                raise
+            if alive:
+                return conn
+            await _run_blocking(_close_conn, conn)
+
+        try:
+            return await _run_blocking(_get_connector(config))
+        except asyncio.CancelledError:
+            call = _running_call.get()
+            if call is not None:
+                call.add_done_callback(_close_opened)
+            raise
+    except BaseException:
+        slots.release()
+        raise
+
+
+@asynccontextmanager
+async def acquire_conn(config, reuse=True):
+    """Borrow a pooled connection, rolling it back before it is reused."""
+    # Operational errors, other exceptions, a failed rollback and reuse=False
+    # close it instead, so a session in an unknown state is never handed on
+    global _pool, _pool_slots
+    if _pool is None:
+        _pool = []
+        _pool_slots = asyncio.Semaphore(get_pool_size())
+    pool, slots = _pool, _pool_slots
+    database_error, operational_error = _db.error_classes()
+
+    conn = await _take_conn(pool, slots, config)
+    error = None
+    try:
+        yield conn
+    except asyncio.CancelledError:
+        _close_when_idle(conn)
+        slots.release()
+        raise
+    except database_error as e:
+        if isinstance(e, operational_error):
+            await _discard_conn(slots, conn)
+            raise
+        error = e
+    except Exception:
+        await _discard_conn(slots, conn)
+        raise
+    except BaseException:
+        # Nothing may be awaited while the generator is closed or the
+        # interpreter is exiting
+        _close_later(conn)
+        slots.release()
+        raise
+
+    try:
+        clean = reuse and await _run_blocking(_rollback, conn)
+    except asyncio.CancelledError:
+        _close_when_idle(conn)
+        slots.release()
+        raise
+    if clean:
+        await _release_conn(pool, slots, conn)
+    else:
+        await _discard_conn(slots, conn)
+    if error is not None:
+        raise error
+
+
+async def close_pool():
+    """Close all idle pooled connections and reset the pool."""
+    global _pool, _pool_slots, _executor
+    pool, _pool, _pool_slots = _pool, None, None
+    while pool:
+        conn, _ = pool.pop()
+        await _run_blocking(_close_conn, conn)
+    if _executor is not None:
+        # Calls still running on checked-out connections finish on their own
+        _executor.shutdown(wait=False)
+        _executor = None
+
+
+# Blocking database work. These helpers run in worker threads via
+# _run_blocking so a slow query never stalls the event loop.
+
+
+def _list_tables(conn):
+    """Fetch the names of user tables in the current database."""
+    with closing(conn.cursor()) as cursor:
         # Query to get user tables from the current database
         cursor.execute(
             """
@@ -131,24 +505,213 @@ async def list_resources() -> list[Resource]:
             WHERE TABLE_TYPE = 'BASE TABLE'
         """
         )
-        tables = cursor.fetchall()
-        logger.info(f"Found tables: {tables}")
+        return cursor.fetchall()
+
+
+def _read_table(conn, safe_table):
+    """Fetch the first rows of an already validated table as CSV text."""
+    with closing(conn.cursor()) as cursor:
+        # Use TOP for MSSQL (equivalent to LIMIT in MySQL).
+        # validate_table_name() always produces the same bracketed text for a
+        # table, so repeated reads send an identical batch that SQL Server
+        # matches in its plan cache. Wrapping this in sp_executesql would not
+        # reduce plans: pymssql substitutes parameters client-side, and each
+        # table needs its own plan anyway.
+        cursor.execute(f"SELECT TOP {RESOURCE_ROW_LIMIT} * FROM {safe_table}")
+        columns = [desc[0] for desc in cursor.description]
+        # Stream rows in batches so the limit can be raised without holding
+        # the whole preview in memory twice
+        cursor.arraysize = RESOURCE_ROW_LIMIT
+        result_text, _ = format_csv(columns, fetch_batches(cursor))
+    return result_text
+
+
+def _format_result_set(cursor):
+    """Format the cursor's current result set as CSV response text."""
+    columns = [desc[0] for desc in cursor.description]
+    max_rows = get_max_rows()
+
+    # Stream rows in batches and format them as CSV
+    cursor.arraysize = FETCH_BATCH_SIZE
+    result_text, row_count = format_csv(columns, fetch_batches(cursor, max_rows))
+
+    # Handle empty result set
+    if row_count == 0:
+        return f"Query returned 0 rows.\nColumns: {', '.join(columns)}"
+
+    # Unread rows are cancelled by the next query on this connection
+    if row_count == max_rows and cursor.fetchone() is not None:
+        logger.warning("Query result truncated to %d rows", max_rows)
+        result_text += f"\n(Result truncated to {max_rows} rows by MSSQL_MAX_ROWS)"
+
+    logger.debug("← Sending response: %d rows returned", row_count)
+    return result_text
+
+
+def _execute_query(conn, query):
+    """Execute a query, commit it and describe its outcome as response text."""
+    # Queries returning rows are committed too, since writes can return rows
+    # (INSERT ... OUTPUT)
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(query)
+
+        # Check if the query returned a result set by examining cursor.description
+        # cursor.description is None for queries that don't return data (INSERT, UPDATE, DELETE, etc.)
+        if cursor.description is not None:
+            # This query returns data (SELECT, WITH, stored procedures that return data, etc.)
+            result_text = _format_result_set(cursor)
+        else:
+            # This is a query that doesn't return data (INSERT, UPDATE, DELETE, DDL, etc.)
+            affected_rows = cursor.rowcount
+
+            # Provide more informative message based on affected rows
+            if affected_rows == -1:
+                # Some operations don't report affected rows (like DDL statements)
+                logger.debug("← Sending response: Query executed (DDL statement)")
+                result_text = "Query executed successfully."
+            else:
+                logger.debug("← Sending response: %d rows affected", affected_rows)
+                result_text = (
+                    f"Query executed successfully. Rows affected: {affected_rows}"
+                )
+    conn.commit()
+    return result_text
+
+
+def _execute_batch(conn, queries):
+    """Execute several queries in one round-trip and describe each result set."""
+    # If the driver raises for any statement, acquire_conn rolls back the batch
+    # Each statement ends on its own line so a trailing comment in one
+    # query cannot swallow the separator
+    batch = "\n;\n".join(query.rstrip().rstrip(";") for query in queries)
+    with closing(conn.cursor()) as cursor:
+        cursor.execute(batch)
+        results = []
+        while True:
+            if cursor.description is not None:
+                results.append(_format_result_set(cursor))
+            if not cursor.nextset():
+                break
+        conn.commit()
+
+    logger.debug("← Sending response: %d result sets", len(results))
+    if not results:
+        return f"Batch of {len(queries)} queries executed successfully."
+    return "\n\n".join(
+        f"Result set {number}:\n{text}" for number, text in enumerate(results, 1)
+    )
+
+
+def _comment_end(query, pos):
+    """Find where a block comment opened just before pos ends (None if never)."""
+    depth = 1
+    for delim in _SQL_COMMENT_DELIM_RE.finditer(query, pos):
+        depth += 1 if delim.group() == "/*" else -1
+        if depth == 0:
+            return delim.end()
+    return None
+
+
+def _sql_structure(query):
+    """Blank out strings, identifiers and comments; report an unterminated one."""
+    parts = []
+    pos = 0
+    while True:
+        start = _SQL_OPAQUE_START_RE.search(query, pos)
+        if start is None:
+            parts.append(query[pos:])
+            return "".join(parts), None
+        parts.append(query[pos : start.start()])
+        token = start.group()
+        if token == "/*":
+            end = _comment_end(query, start.end())
+        else:
+            match = _SQL_OPAQUE_END_RES[token].match(query, start.end())
+            end = match and match.end()
+        if end is None:
+            return "".join(parts), _SQL_UNTERMINATED[token]
+        parts.append(" ")
+        pos = end
+
+
+def check_query(query: str):
+    """Catch obviously malformed SQL before sending it to the server."""
+    # Returns a description of the problem, or None; the server remains the
+    # real validator
+    structure, problem = _sql_structure(query)
+    if problem:
+        return problem
+    if not structure.strip(" \t\r\n;"):
+        return "query contains no SQL statements"
+    return None
+
+
+def check_batch(queries: list[str]):
+    """Catch batches that would not run as separate statements."""
+    # Everything after a CREATE PROCEDURE and the like would join its body
+    if len(queries) > 1 and any(
+        _BATCH_ALONE_RE.search(_sql_structure(query)[0]) for query in queries
+    ):
+        return (
+            "CREATE or ALTER of a procedure, view, function or trigger, and "
+            "CREATE of a schema, default or rule, must be executed on its own"
+        )
+    return None
+
+
+# Last list_resources result as (config, expires_at, tables, resources)
+_resources_cache = None
+
+
+def _invalidate_resources():
+    """Expire the cached table list so the next listing queries the server."""
+    global _resources_cache
+    if _resources_cache is not None:
+        config, _, tables, resources = _resources_cache
+        _resources_cache = (config, 0.0, tables, resources)
+
+
+# Initialize server
+app = Server("mssql_mcp_server")
+
+# Table resources are served as CSV text
+RESOURCE_MIME_TYPE = "text/plain"
+
 
-        resources = []
-        for table in tables:
-            resources.append(
+@app.list_resources()
+async def list_resources() -> list[Resource]:
+    """List SQL Server tables as resources."""
+    # Cached for MSSQL_RESOURCE_CACHE_TTL seconds, since clients re-list far
+    # more often than the schema changes
+    global _resources_cache
+    config = get_db_config()
+    cached = _resources_cache
+    if cached is not None and cached[0] is not config:
+        cached = None
+    if cached is not None and time.monotonic() < cached[1]:
+        return cached[3]
+    try:
+        async with acquire_conn(config) as conn:
+            tables = await _run_blocking(_list_tables, conn)
+        logger.info("Found tables: %s", tables)
+
+        if cached is not None and cached[2] == tables:
+            resources = cached[3]
+        else:
+            resources = [
                 Resource(
-                    uri=f"mssql://{table[0]}/data",
-                    name=f"Table: {table[0]}",
-                    mimeType="text/plain",
-                    description=f"Data in table: {table[0]}",
+                    uri=f"mssql://{table}/data",
+                    name=f"Table: {table}",
+                    mimeType=RESOURCE_MIME_TYPE,
+                    description=f"Data in table: {table}",
                 )
-            )
-        cursor.close()
-        conn.close()
+                for (table,) in tables
+            ]
+        expires_at = time.monotonic() + get_resource_cache_ttl()
+        _resources_cache = (config, expires_at, tables, resources)
         return resources
     except Exception as e:
-        logger.error(f"Failed to list resources: {str(e)}")
+        logger.error("Failed to list resources: %s", e)
         return []
 
 
@@ -157,40 +720,30 @@ async def read_resource(uri: AnyUrl) -> str:
     """Read table contents."""
     config = get_db_config()
     uri_str = str(uri)
-    logger.info(f"Reading resource: {uri_str}")
+    logger.info("Reading resource: %s", uri_str)
 
-    if not uri_str.startswith("mssql://"):
+    parsed = urlsplit(uri_str)
+    if parsed.scheme != "mssql":
         raise ValueError(f"Invalid URI scheme: {uri_str}")
 
-    parts = uri_str[8:].split("/")
-    table = parts[0]
+    # The table is the URI host (mssql://<table>/data)
+    table = parsed.netloc or parsed.path.lstrip("/").split("/", 1)[0]
 
     try:
         # Validate table name to prevent SQL injection
         safe_table = validate_table_name(table)
 
-        conn = pymssql.connect(**config)
-        cursor = conn.cursor()
-        # Use TOP 100 for MSSQL (equivalent to LIMIT in MySQL)
-        cursor.execute(f"SELECT TOP 100 * FROM {safe_table}")
-        columns = [desc[0] for desc in cursor.description]
-        rows = cursor.fetchall()
-        result = [",".join(map(str, row)) for row in rows]
-        cursor.close()
-        conn.close()
-        return "\n".join([",".join(columns)] + result)
+        async with acquire_conn(config) as conn:
+            return await _run_blocking(_read_table, conn, safe_table)
 
     except Exception as e:
-        logger.error(f"Database error reading resource {uri}: {str(e)}")
+        logger.error("Database error reading resource %s: %s", uri, e)
         raise RuntimeError(f"Database error: {str(e)}")
 
 
-@app.list_tools()
-async def list_tools() -> list[Tool]:
-    """List available SQL Server tools."""
-    command = get_command()
-    logger.info("Listing tools...")
-    logger.debug("→ Received request: tools/list")
+@functools.cache
+def _build_tools(command: str) -> list[Tool]:
+    """Build the tool list for a command name."""
     return [
         Tool(
             name=command,
@@ -205,98 +758,99 @@ async def list_tools() -> list[Tool]:
                 },
                 "required": ["query"],
             },
-        )
+        ),
+        Tool(
+            name=f"{command}_batch",
+            description=(
+                "Execute several SQL queries on the SQL Server in one round-trip. "
+                "They are committed together once the batch completes; if any "
+                "query reports an error the whole batch is rolled back, although "
+                "queries after the failing one may already have run. Procedures, "
+                "views, functions and triggers must be created one at a time."
+            ),
+            inputSchema={
+                "type": "object",
+                "properties": {
+                    "queries": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "The SQL queries to execute, in order",
+                    }
+                },
+                "required": ["queries"],
+            },
+        ),
     ]
 
 
+@app.list_tools()
+async def list_tools() -> list[Tool]:
+    """List available SQL Server tools."""
+    logger.info("Listing tools...")
+    logger.debug("→ Received request: tools/list")
+    return _build_tools(get_command())
+
+
 @app.call_tool()
 async def call_tool(name: str, arguments: dict) -> list[TextContent]:
     """Execute SQL commands."""
-    config = get_db_config()
     command = get_command()
-    logger.info(f"Calling tool: {name} with arguments: {arguments}")
-    logger.debug(f"→ Received request: tools/call {name}")
-
-    if name != command:
+    logger.info("Calling tool: %s with arguments: %s", name, arguments)
+    logger.debug("→ Received request: tools/call %s", name)
+
+    queries: list[str]
+    if name == command:
+        query = arguments.get("query")
+        if not query:
+            raise ValueError("Query is required")
+        if not isinstance(query, str):
+            raise ValueError("Query must be a string")
+        queries = [query]
+        execute = functools.partial(_execute_query, query=query)
+    elif name == f"{command}_batch":
+        batch = arguments.get("queries")
+        if not batch:
+            raise ValueError("Queries are required")
+        if not isinstance(batch, list) or not all(
+            isinstance(q, str) and q.strip() for q in batch
+        ):
+            raise ValueError("Queries must be a list of non-empty SQL strings")
+        queries = batch
+        query = "; ".join(queries)  # For log messages
+        execute = functools.partial(_execute_batch, queries=queries)
+    else:
         raise ValueError(f"Unknown tool: {name}")
 
-    query = arguments.get("query")
-    if not query:
-        raise ValueError("Query is required")
-
-    conn = None
-    cursor = None
+    config = get_db_config()
+    # Reject queries that would certainly fail without a round-trip
+    for statement in queries:
+        problem = check_query(statement)
+        if problem:
+            logger.error("Rejected SQL '%s': %s", statement, problem)
+            return [TextContent(type="text", text=f"Invalid query: {problem}")]
+    problem = check_batch(queries)
+    if problem:
+        logger.error("Rejected SQL batch '%s': %s", query, problem)
+        return [TextContent(type="text", text=f"Invalid query: {problem}")]
+    changes_schema = any(map(_SCHEMA_CHANGE_RE.search, queries))
+    changes_session = any(map(_SESSION_CHANGE_RE.search, queries))
+    database_error, _ = _db.error_classes()
     try:
-        conn = pymssql.connect(**config)
-        cursor = conn.cursor()
-        cursor.execute(query)
-
-        # Check if the query returned a result set by examining cursor.description
-        # cursor.description is None for queries that don't return data (INSERT, UPDATE, DELETE, etc.)
-        if cursor.description is not None:
-            # This query returns data (SELECT, WITH, stored procedures that return data, etc.)
-            columns = [desc[0] for desc in cursor.description]
-            rows = cursor.fetchall()
-
-            # Handle empty result set
-            if not rows:
-                return [
-                    TextContent(
-                        type="text",
-                        text=f"Query returned 0 rows.\nColumns: {', '.join(columns)}",
-                    )
-                ]
-
-            # Format results as CSV-like output
-            result = [",".join(columns)]  # Header row
-            for row in rows:
-                # Handle NULL values and convert all values to strings
-                row_values = []
-                for value in row:
-                    if value is None:
-                        row_values.append("NULL")
-                    else:
-                        row_values.append(str(value))
-                result.append(",".join(row_values))
-
-            result_text = "\n".join(result)
-            logger.debug(f"← Sending response: {len(rows)} rows returned")
-            return [TextContent(type="text", text=result_text)]
-        else:
-            # This is a query that doesn't return data (INSERT, UPDATE, DELETE, DDL, etc.)
-            # Commit the transaction for DML operations
-            conn.commit()
-            affected_rows = cursor.rowcount
+        async with acquire_conn(config, reuse=not changes_session) as conn:
+            result_text = await _run_blocking(execute, conn)
+        return [TextContent(type="text", text=result_text)]
 
-            # Provide more informative message based on affected rows
-            if affected_rows == -1:
-                # Some operations don't report affected rows (like DDL statements)
-                logger.debug("← Sending response: Query executed (DDL statement)")
-                return [TextContent(type="text", text="Query executed successfully.")]
-            else:
-                logger.debug(f"← Sending response: {affected_rows} rows affected")
-                return [
-                    TextContent(
-                        type="text",
-                        text=f"Query executed successfully. Rows affected: {affected_rows}",
-                    )
-                ]
-
-    except pymssql.DatabaseError as e:
-        logger.error(f"Database error executing SQL '{query}': {e}")
-        # Rollback transaction on error
-        if conn:
-            conn.rollback()
+    except database_error as e:
+        logger.error("Database error executing SQL '%s': %s", query, e)
+        # acquire_conn rolls back (or discards) the failed connection
         return [TextContent(type="text", text=f"Database error: {str(e)}")]
     except Exception as e:
-        logger.error(f"Unexpected error executing SQL '{query}': {e}")
+        logger.error("Unexpected error executing SQL '%s': %s", query, e)
         return [TextContent(type="text", text=f"Error executing query: {str(e)}")]
     finally:
-        # Ensure resources are properly cleaned up
-        if cursor:
-            cursor.close()
-        if conn:
-            conn.close()
+        # Even a failed DDL batch may have changed some tables
+        if changes_schema:
+            _invalidate_resources()
 
 
 async def main():
@@ -305,12 +859,18 @@ async def main():
 
     logger.info("Starting MSSQL MCP server...")
     config = get_db_config()
+    # Fail at startup rather than on the first request if the driver is
+    # unknown or not installed; it is still only imported on first use
+    _db.check_driver()
+    logger.info("Using database driver: %s", _db.get_driver())
     # Log connection info without exposing sensitive data
     server_info = config["server"]
     if "port" in config:
         server_info += f":{config['port']}"
     user_info = config.get("user", "Windows Auth")
-    logger.info(f"Database config: {server_info}/{config['database']} as {user_info}")
+    logger.info(
+        "Database config: %s/%s as %s", server_info, config["database"], user_info
+    )
 
     async with stdio_server() as (read_stream, write_stream):
         try:
@@ -318,9 +878,22 @@ async def main():
                 read_stream, write_stream, app.create_initialization_options()
             )
         except Exception as e:
-            logger.error(f"Server error: {str(e)}", exc_info=True)
+            logger.error("Server error: %s", e, exc_info=True)
             raise
+        finally:
+            await close_pool()
+
+
+def run():
+    """Run the MCP server, using the uvloop event loop when it is installed."""
+    try:
+        import uvloop
+    except ImportError:
+        # uvloop is not available on Windows; use the default event loop
+        asyncio.run(main())
+    else:
+        uvloop.run(main())
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    run()
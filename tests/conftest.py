@@ -1,9 +1,98 @@
 # tests/conftest.py
 import os
+from unittest.mock import MagicMock, Mock
 
 import pymssql
 import pytest
 
+from yulin_mssql_mcp import _db
+from yulin_mssql_mcp.server import (close_pool, get_command, get_db_config,
+                                    get_max_rows, get_resource_cache_ttl)
+
+
+@pytest.fixture(autouse=True)
+def _clear_config_cache():
+    """Re-read environment configuration in every test."""
+    get_db_config.cache_clear()
+    get_command.cache_clear()
+    get_max_rows.cache_clear()
+    get_resource_cache_ttl.cache_clear()
+    _db.get_driver.cache_clear()
+    yield
+    get_db_config.cache_clear()
+    get_command.cache_clear()
+    get_max_rows.cache_clear()
+    get_resource_cache_ttl.cache_clear()
+    _db.get_driver.cache_clear()
+
+
+@pytest.fixture(scope="module")
+def mssql_env():
+    """Set the SQL authentication environment once for a whole test module.
+
+    Tests that need a different value, or none, override it with the
+    function-scoped ``monkeypatch`` fixture, which restores this one.
+    """
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setenv("MSSQL_USER", "test")
+        mp.setenv("MSSQL_PASSWORD", "test")
+        mp.setenv("MSSQL_DATABASE", "testdb")
+        yield
+
+
+# DB-API attributes the server uses; specced mocks reject anything else
+_CONNECTION_ATTRS = ["cursor", "commit", "rollback", "close"]
+_CURSOR_ATTRS = [
+    "execute",
+    "fetchone",
+    "fetchmany",
+    "fetchall",
+    "nextset",
+    "close",
+    "description",
+    "rowcount",
+    "arraysize",
+]
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """Patch pymssql.connect to return a mock connection.
+
+    Yields the ``(connection, cursor)`` pair so tests only need to set the
+    return values and side effects they care about.
+    """
+    conn = MagicMock(spec=_CONNECTION_ATTRS)
+    cursor = MagicMock(spec=_CURSOR_ATTRS)
+    conn.cursor.return_value = cursor
+    # Behave like a statement without a result set until a test says otherwise
+    cursor.description = None
+    cursor.rowcount = -1
+    cursor.fetchone.return_value = None
+    cursor.fetchmany.return_value = []
+    cursor.fetchall.return_value = []
+    cursor.nextset.return_value = None
+    monkeypatch.setattr("pymssql.connect", lambda **kwargs: conn)
+    yield conn, cursor
+
+
+@pytest.fixture
+def mock_connect(mock_db, monkeypatch):
+    """Patch pymssql.connect like mock_db, returning the patched mock.
+
+    For tests that count how many connections the server opens.
+    """
+    connect = Mock(return_value=mock_db[0])
+    monkeypatch.setattr("pymssql.connect", connect)
+    return connect
+
+
+@pytest.fixture(autouse=True)
+async def _reset_connection_pool():
+    """Drop pooled connections so mocked connections never leak across tests."""
+    yield
+    await close_pool()
+
 
 @pytest.fixture(scope="session")
 def mssql_connection():
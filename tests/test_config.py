@@ -1,10 +1,11 @@
 """Test database configuration and environment variable handling."""
 
 import os
-from unittest.mock import patch
+from unittest.mock import Mock, patch
 
 import pytest
 
+from yulin_mssql_mcp import _db
 from yulin_mssql_mcp.server import get_db_config, validate_table_name
 
 
@@ -29,6 +30,21 @@ class TestDatabaseConfiguration:
             assert config["database"] == "testdb"
             assert "port" not in config
 
+    def test_configuration_is_cached_and_read_only(self):
+        """Test that the cached configuration cannot be modified by callers."""
+        with patch.dict(
+            os.environ,
+            {
+                "MSSQL_USER": "testuser",
+                "MSSQL_PASSWORD": "testpass",
+                "MSSQL_DATABASE": "testdb",
+            },
+        ):
+            config = get_db_config()
+            assert get_db_config() is config
+            with pytest.raises(TypeError):
+                config["server"] = "other"
+
     def test_custom_server_and_port(self):
         """Test custom server and port configuration."""
         with patch.dict(
@@ -74,6 +90,20 @@ class TestDatabaseConfiguration:
             assert config["encrypt"] == True
             assert config["tds_version"] == "7.4"
 
+    def test_azure_sql_detection_requires_suffix(self):
+        """Test that only hostnames ending in the Azure suffix count as Azure SQL."""
+        with patch.dict(
+            os.environ,
+            {
+                "MSSQL_SERVER": "myserver.database.windows.net.example.com",
+                "MSSQL_USER": "testuser",
+                "MSSQL_PASSWORD": "testpass",
+                "MSSQL_DATABASE": "testdb",
+            },
+        ):
+            config = get_db_config()
+            assert "tds_version" not in config
+
     def test_localdb_configuration(self):
         """Test LocalDB connection string conversion."""
         with patch.dict(
@@ -89,6 +119,19 @@ class TestDatabaseConfiguration:
             assert "user" not in config
             assert "password" not in config
 
+    def test_localdb_prefix_is_case_insensitive(self):
+        """Test that the LocalDB prefix is recognised regardless of case."""
+        with patch.dict(
+            os.environ,
+            {
+                "MSSQL_SERVER": "(LocalDB)\\MSSQLLocalDB",
+                "MSSQL_DATABASE": "testdb",
+                "MSSQL_WINDOWS_AUTH": "true",
+            },
+        ):
+            config = get_db_config()
+            assert config["server"] == ".\\MSSQLLocalDB"
+
     def test_windows_authentication(self):
         """Test Windows authentication configuration."""
         with patch.dict(
@@ -103,6 +146,21 @@ class TestDatabaseConfiguration:
             assert "user" not in config
             assert "password" not in config
 
+    def test_windows_authentication_flag_values(self):
+        """Test that common truthy spellings enable Windows authentication."""
+        for value in ["1", "TRUE", "yes", " on "]:
+            get_db_config.cache_clear()
+            with patch.dict(
+                os.environ,
+                {
+                    "MSSQL_SERVER": "localhost",
+                    "MSSQL_DATABASE": "testdb",
+                    "MSSQL_WINDOWS_AUTH": value,
+                },
+            ):
+                config = get_db_config()
+                assert "user" not in config
+
     def test_missing_required_config_sql_auth(self):
         """Test missing required configuration for SQL authentication."""
         with patch.dict(os.environ, {"MSSQL_SERVER": "localhost"}, clear=True):
@@ -135,6 +193,8 @@ class TestDatabaseConfiguration:
             config = get_db_config()
             assert config["encrypt"] == True
 
+        get_db_config.cache_clear()
+
         # Non-Azure without encryption (default)
         with patch.dict(
             os.environ,
@@ -194,3 +254,94 @@ class TestTableNameValidation:
         assert validate_table_name("users") == "[users]"
         assert validate_table_name("dbo.users") == "[dbo].[users]"
         assert validate_table_name("my_table_123") == "[my_table_123]"
+
+
+class TestDriverSelection:
+    """Test database driver selection via MSSQL_DRIVER."""
+
+    def test_default_driver(self):
+        """Test that pymssql is used when no driver is configured."""
+        with patch.dict(os.environ, {}, clear=True):
+            assert _db.get_driver() == "pymssql"
+            assert _db.module().__name__ == "pymssql"
+
+    def test_unsupported_driver(self):
+        """Test that an unknown driver name is rejected."""
+        with patch.dict(os.environ, {"MSSQL_DRIVER": "odbc"}):
+            with pytest.raises(ValueError, match="Unsupported MSSQL_DRIVER"):
+                _db.get_driver()
+
+    def test_odbc_connection_string(self):
+        """Test ODBC connection string construction and value quoting."""
+        conn_str = _db.odbc_connection_string(
+            {
+                "server": "myserver.database.windows.net",
+                "port": 1433,
+                "database": "testdb",
+                "user": "testuser",
+                "password": "p;w}d",
+                "tds_version": "7.4",
+                "encrypt": True,
+            },
+            "ODBC Driver 18 for SQL Server",
+        )
+        assert conn_str == (
+            "DRIVER={ODBC Driver 18 for SQL Server};"
+            "SERVER={myserver.database.windows.net,1433};DATABASE={testdb};"
+            "UID={testuser};PWD={p;w}}d};Encrypt=yes"
+        )
+
+    def test_odbc_connection_string_windows_auth(self):
+        """Test that Windows authentication uses a trusted connection."""
+        conn_str = _db.odbc_connection_string(
+            {"server": "localhost", "database": "testdb"}
+        )
+        assert conn_str == (
+            "SERVER={localhost};DATABASE={testdb};Trusted_Connection=yes;Encrypt=no"
+        )
+
+    def test_odbc_connection_string_encryption_settings(self):
+        """Test that MSSQL_ENCRYPT and MSSQL_TRUST_SERVER_CERTIFICATE are applied."""
+        with patch.dict(
+            os.environ,
+            {
+                "MSSQL_ENCRYPT": "true",
+                "MSSQL_TRUST_SERVER_CERTIFICATE": "true",
+                "MSSQL_USER": "testuser",
+                "MSSQL_PASSWORD": "testpass",
+                "MSSQL_DATABASE": "testdb",
+            },
+        ):
+            conn_str = _db.odbc_connection_string(get_db_config())
+        assert conn_str.endswith(";Encrypt=yes;TrustServerCertificate=yes")
+
+    def test_pymssql_ignores_odbc_settings(self, monkeypatch):
+        """Test that encryption settings are not passed to pymssql.connect."""
+        connect = Mock()
+        monkeypatch.setattr("pymssql.connect", connect)
+        with patch.dict(
+            os.environ,
+            {
+                "MSSQL_ENCRYPT": "true",
+                "MSSQL_USER": "testuser",
+                "MSSQL_PASSWORD": "testpass",
+                "MSSQL_DATABASE": "testdb",
+            },
+        ):
+            _db.connector(get_db_config())()
+        assert "encrypt" not in connect.call_args.kwargs
+        assert "trust_server_certificate" not in connect.call_args.kwargs
+
+    def test_localdb_server_kept_for_odbc(self):
+        """Test that the LocalDB rewrite for pymssql is not applied to ODBC drivers."""
+        with patch.dict(
+            os.environ,
+            {
+                "MSSQL_DRIVER": "pyodbc",
+                "MSSQL_SERVER": "(localdb)\\MSSQLLocalDB",
+                "MSSQL_DATABASE": "testdb",
+                "MSSQL_WINDOWS_AUTH": "true",
+            },
+        ):
+            conn_str = _db.odbc_connection_string(get_db_config())
+        assert conn_str.startswith("SERVER={(localdb)\\MSSQLLocalDB};")
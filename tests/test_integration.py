@@ -1,14 +1,23 @@
 """Integration tests for MCP protocol communication and end-to-end functionality."""
 
 import asyncio
+import itertools
 import json
-from unittest.mock import AsyncMock, Mock, patch
+import threading
+import time
+from unittest.mock import MagicMock, call
 
 import pytest
 from mcp.server.stdio import stdio_server
 from mcp.types import Resource, TextContent, Tool
+from pydantic import AnyUrl
+from pymssql import OperationalError, ProgrammingError
 
-from yulin_mssql_mcp.server import app
+from yulin_mssql_mcp.server import (FETCH_BATCH_SIZE, app, call_tool,
+                                    close_pool, list_resources, list_tools,
+                                    read_resource)
+
+pytestmark = pytest.mark.usefixtures("mssql_env")
 
 
 class TestMCPProtocolIntegration:
@@ -24,262 +33,485 @@ class TestMCPProtocolIntegration:
         assert hasattr(init_options, "capabilities")
 
     @pytest.mark.asyncio
-    async def test_full_mcp_lifecycle(self):
-        """Test complete MCP server lifecycle from init to shutdown."""
-        # Mock the stdio streams
-        mock_read_stream = AsyncMock()
-        mock_write_stream = AsyncMock()
-
-        # Mock database connection
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Test resource listing
-                mock_cursor.fetchall.return_value = [("users",), ("products",)]
-                resources = await app.list_resources()
-
-                assert len(resources) == 2
-                assert all(isinstance(r, Resource) for r in resources)
-                assert resources[0].name == "Table: users"
-                assert resources[1].name == "Table: products"
-
-                # Test tool listing
-                tools = await app.list_tools()
-                assert len(tools) == 1
-                assert tools[0].name == "execute_sql"
-
-                # Test tool execution
-                mock_cursor.description = [("count",)]
-                mock_cursor.fetchall.return_value = [(42,)]
-                result = await app.call_tool(
-                    "execute_sql", {"query": "SELECT COUNT(*) FROM users"}
-                )
-
-                assert len(result) == 1
-                assert isinstance(result[0], TextContent)
-                assert "42" in result[0].text
+    async def test_resources_and_tools_listing(self, mock_db):
+        """Test listing resources and tools through the MCP server."""
+        _, mock_cursor = mock_db
+
+        # Test resource listing
+        mock_cursor.fetchall.return_value = [("users",), ("products",)]
+        resources = await list_resources()
+
+        assert len(resources) == 2
+        assert all(isinstance(r, Resource) for r in resources)
+        assert resources[0].name == "Table: users"
+        assert resources[1].name == "Table: products"
+
+        # Test tool listing
+        tools = await list_tools()
+        assert len(tools) == 2
+        assert tools[0].name == "execute_sql"
 
     @pytest.mark.asyncio
-    async def test_concurrent_requests(self):
+    async def test_tool_execution_returns_count(self, mock_db):
+        """Test executing a query through the MCP server."""
+        _, mock_cursor = mock_db
+
+        mock_cursor.description = [("count",)]
+        mock_cursor.fetchmany.side_effect = [[(42,)], []]
+        result = await call_tool("execute_sql", {"query": "SELECT COUNT(*) FROM users"})
+
+        assert len(result) == 1
+        assert isinstance(result[0], TextContent)
+        assert "42" in result[0].text
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests(self, mock_db):
         """Test handling of concurrent MCP requests."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Simulate concurrent resource listing
-                mock_cursor.fetchall.return_value = [("table1",), ("table2",)]
-
-                # Run multiple concurrent requests
-                tasks = [app.list_resources() for _ in range(10)]
-                results = await asyncio.gather(*tasks)
-
-                # All should succeed
-                assert len(results) == 10
-                for result in results:
-                    assert len(result) == 2
+        mock_conn, _ = mock_db
+
+        # Give each request its own cursor, as separate pooled connections would
+        def make_cursor():
+            cursor = MagicMock()
+            cursor.fetchall.return_value = [("table1",), ("table2",)]
+            return cursor
+
+        mock_conn.cursor.side_effect = make_cursor
+
+        # Run more concurrent requests than the pool has connections
+        tasks = [list_resources() for _ in range(20)]
+        results = await asyncio.gather(*tasks)
+
+        # All should succeed
+        assert len(results) == 20
+        for result in results:
+            assert len(result) == 2
 
     @pytest.mark.asyncio
-    async def test_error_propagation(self):
+    async def test_error_propagation(self, monkeypatch):
         """Test that errors are properly propagated through MCP protocol."""
-        with patch.dict("os.environ", {}, clear=True):
-            # Missing configuration should raise error
-            with pytest.raises(
-                ValueError, match="Missing required database configuration"
-            ):
-                await app.list_resources()
+        for name in ("MSSQL_USER", "MSSQL_PASSWORD", "MSSQL_DATABASE"):
+            monkeypatch.delenv(name, raising=False)
+
+        # Missing configuration should raise error
+        with pytest.raises(ValueError, match="Missing required database configuration"):
+            await list_resources()
 
 
 class TestDatabaseIntegration:
     """Test actual database integration scenarios."""
 
     @pytest.mark.asyncio
-    async def test_connection_pooling(self):
+    async def test_connection_pooling(self, mock_db, mock_connect):
         """Test that connections are properly managed and pooled."""
-        call_count = 0
-
-        def mock_connect(**kwargs):
-            nonlocal call_count
-            call_count += 1
-            mock_conn = Mock()
-            mock_cursor = Mock()
-            mock_cursor.fetchall.return_value = []
-            mock_conn.cursor.return_value = mock_cursor
-            return mock_conn
-
-        with patch("pymssql.connect", side_effect=mock_connect):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Multiple operations should create multiple connections
-                # (current implementation doesn't pool)
-                for _ in range(5):
-                    await app.list_resources()
-
-                assert call_count == 5  # One connection per operation
+        _, mock_cursor = mock_db
+
+        # Sequential operations should reuse one pooled connection
+        await list_resources()
+        for _ in range(5):
+            await call_tool("execute_sql", {"query": "SELECT 1"})
+
+        assert mock_cursor.execute.call_count == 6
+        assert mock_connect.call_count == 1  # Connection is reused from the pool
 
     @pytest.mark.asyncio
-    async def test_transaction_handling(self):
+    async def test_concurrent_requests_bounded_by_pool_size(
+        self, mock_db, mock_connect, monkeypatch
+    ):
+        """Test that concurrent requests share at most MSSQL_POOL_SIZE connections."""
+        monkeypatch.setenv("MSSQL_POOL_SIZE", "2")
+        _, mock_cursor = mock_db
+        # Hold each connection briefly so the requests overlap
+        mock_cursor.execute.side_effect = lambda query: time.sleep(0.01)
+        mock_cursor.rowcount = 1
+
+        query = {"query": "UPDATE t SET x = 1"}
+        results = await asyncio.gather(
+            *(call_tool("execute_sql", query) for _ in range(10))
+        )
+        assert all("Rows affected: 1" in r[0].text for r in results)
+        assert mock_connect.call_count == 2
+
+        # Once the pool is warm, further requests open no connections
+        for _ in range(5):
+            await call_tool("execute_sql", query)
+        assert mock_connect.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_discarded_connection_frees_slot_for_waiter(
+        self, mock_db, mock_connect, monkeypatch
+    ):
+        """Test that a request waiting for a full pool gets a discarded slot."""
+        monkeypatch.setenv("MSSQL_POOL_SIZE", "1")
+        _, mock_cursor = mock_db
+
+        def execute(query):
+            time.sleep(0.01)
+            if query == "SELECT 1":
+                raise OperationalError("lost")
+
+        mock_cursor.execute.side_effect = execute
+        mock_cursor.rowcount = 1
+
+        lost, waiter = await asyncio.wait_for(
+            asyncio.gather(
+                call_tool("execute_sql", {"query": "SELECT 1"}),
+                call_tool("execute_sql", {"query": "UPDATE t SET x = 1"}),
+            ),
+            timeout=5,
+        )
+        assert lost[0].text == "Database error: lost"
+        assert "Rows affected: 1" in waiter[0].text
+        assert mock_connect.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_pooled_connection_returned_clean(self, mock_db, mock_connect):
+        """Test that a connection is committed and rolled back before reuse."""
+        mock_conn, mock_cursor = mock_db
+
+        # A write that returns rows is still committed by its own request
+        mock_cursor.description = [("id",)]
+        mock_cursor.fetchmany.side_effect = [[(1,)], []]
+        await call_tool(
+            "execute_sql",
+            {"query": "INSERT INTO t OUTPUT inserted.id DEFAULT VALUES"},
+        )
+        # Anything still open is rolled back before the pool hands it out
+        assert mock_conn.mock_calls[-2:] == [call.commit(), call.rollback()]
+
+        await list_resources()
+        assert mock_connect.call_count == 1
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "USE otherdb",
+            "SET NOCOUNT ON",
+            "SELECT * INTO #t FROM users",
+            "EXECUTE AS USER = 'reader'",
+            "EXEC sp_setapprole 'app_role', 'secret'",
+            "SETUSER 'reader'",
+            "EXEC sp_set_session_context 'tenant', 42",
+            "OPEN SYMMETRIC KEY k DECRYPTION BY PASSWORD = 'secret'",
+            "DECLARE c CURSOR FOR SELECT 1",
+            "DECLARE c INSENSITIVE SCROLL CURSOR FOR SELECT 1",
+        ],
+        ids=[
+            "use",
+            "set_option",
+            "temp_table",
+            "execute_as",
+            "app_role",
+            "setuser",
+            "session_context",
+            "symmetric_key",
+            "cursor",
+            "cursor_options",
+        ],
+    )
+    async def test_session_change_closes_connection(self, mock_db, mock_connect, query):
+        """Test that a connection whose session state changed is not pooled."""
+        mock_conn, _ = mock_db
+
+        await call_tool("execute_sql", {"query": query})
+        mock_conn.close.assert_called_once()
+
+        await call_tool("execute_sql", {"query": "UPDATE t SET x = 1"})
+        await call_tool("execute_sql", {"query": "UPDATE t SET x = 1"})
+        assert mock_connect.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_cancelled_request_closes_connection(self, mock_db, mock_connect):
+        """Test that a cancelled request closes its connection once the query ends."""
+        mock_conn, mock_cursor = mock_db
+        started, finish = threading.Event(), threading.Event()
+
+        def execute(query):
+            started.set()
+            finish.wait(5)
+
+        mock_cursor.execute.side_effect = execute
+
+        task = asyncio.create_task(call_tool("execute_sql", {"query": "SELECT 1"}))
+        await asyncio.to_thread(started.wait, 5)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        # Not closed while the worker thread is still using it
+        mock_conn.close.assert_not_called()
+
+        finish.set()
+        for _ in range(100):
+            if mock_conn.close.called:
+                break
+            await asyncio.sleep(0.01)
+        mock_conn.close.assert_called_once()
+
+        # The slot was released, so a new connection can be opened
+        await call_tool("execute_sql", {"query": "UPDATE t SET x = 1"})
+        assert mock_connect.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_resource_list_caching(self, mock_db):
+        """Test that the table list is cached until a query changes the schema."""
+        _, mock_cursor = mock_db
+        mock_cursor.fetchall.return_value = [("users",)]
+
+        assert len(await list_resources()) == 1
+        mock_cursor.fetchall.return_value = [("users",), ("orders",)]
+        assert len(await list_resources()) == 1  # Served from the cache
+
+        mock_cursor.description = None
+        mock_cursor.rowcount = -1
+        await call_tool("execute_sql", {"query": "CREATE TABLE orders (id INT)"})
+        assert len(await list_resources()) == 2
+
+    @pytest.mark.asyncio
+    async def test_resource_models_reused_for_unchanged_tables(
+        self, mock_db, monkeypatch
+    ):
+        """Test that an unchanged table list reuses the previously built resources."""
+        _, mock_cursor = mock_db
+        mock_cursor.fetchall.return_value = [("users",)]
+
+        monkeypatch.setenv("MSSQL_RESOURCE_CACHE_TTL", "0")
+
+        first = await list_resources()
+        second = await list_resources()
+        assert mock_cursor.execute.call_count == 2  # Queried both times
+        assert second is first
+
+        mock_cursor.fetchall.return_value = [("users",), ("orders",)]
+        assert len(await list_resources()) == 2
+
+    @pytest.mark.asyncio
+    async def test_pool_error_handling(self, mock_db, mock_connect):
+        """Test that only connection errors drop the pooled connection."""
+        mock_conn, mock_cursor = mock_db
+
+        # A failed statement is rolled back and the connection reused
+        mock_cursor.execute.side_effect = ProgrammingError("bad")
+        await call_tool("execute_sql", {"query": "SELEC 1"})
+        await call_tool("execute_sql", {"query": "SELEC 1"})
+        assert mock_conn.rollback.call_count == 2  # Once per release
+        mock_conn.close.assert_not_called()
+        assert mock_connect.call_count == 1
+
+        # A lost connection is closed and replaced
+        mock_cursor.execute.side_effect = OperationalError("lost")
+        await call_tool("execute_sql", {"query": "SELECT 1"})
+        mock_conn.close.assert_called_once()
+        await call_tool("execute_sql", {"query": "SELECT 1"})
+        assert mock_connect.call_count == 2
+
+    @pytest.mark.asyncio
+    async def test_connections_closed_in_worker_threads(self, mock_db, monkeypatch):
+        """Test that closing connections never blocks the event loop."""
+        mock_conn, mock_cursor = mock_db
+        monkeypatch.setenv("MSSQL_POOL_SIZE", "2")
+        closed_in = []
+        mock_conn.close.side_effect = lambda: closed_in.append(
+            threading.current_thread().name
+        )
+
+        # One connection is discarded after a lost connection, one is pooled
+        mock_cursor.execute.side_effect = [OperationalError("lost"), None]
+        await call_tool("execute_sql", {"query": "SELECT 1"})
+        await call_tool("execute_sql", {"query": "UPDATE t SET x = 1"})
+        await close_pool()
+
+        assert len(closed_in) == 2
+        assert all(name.startswith("mssql") for name in closed_in)
+
+    @pytest.mark.asyncio
+    async def test_batch_execution(self, mock_db):
+        """Test that a batch is sent in one round-trip and reports each result set."""
+        mock_conn, mock_cursor = mock_db
+
+        mock_cursor.description = [("n",)]
+        mock_cursor.fetchmany.side_effect = [[(1,)], [], [(2,)], []]
+        mock_cursor.nextset.side_effect = [True, None]
+
+        result = await call_tool(
+            "execute_sql_batch", {"queries": ["SELECT 1;", "SELECT 2"]}
+        )
+
+        mock_cursor.execute.assert_called_once_with("SELECT 1\n;\nSELECT 2")
+        mock_conn.commit.assert_called_once()
+        assert result[0].text == "Result set 1:\nn\n1\n\nResult set 2:\nn\n2"
+
+    @pytest.mark.asyncio
+    async def test_batch_rejects_routine_definitions(self, mock_db):
+        """Test that a batch cannot define a procedure, view, function or trigger."""
+        _, mock_cursor = mock_db
+
+        result = await call_tool(
+            "execute_sql_batch",
+            {"queries": ["CREATE OR ALTER VIEW v AS SELECT 1 AS n", "SELECT 2"]},
+        )
+
+        assert result[0].text.startswith("Invalid query: CREATE or ALTER")
+        mock_cursor.execute.assert_not_called()
+
+        # Only mentioned in a string or comment, it is sent as usual
+        await call_tool(
+            "execute_sql_batch",
+            {"queries": ["SELECT 'CREATE VIEW v' -- not a definition", "SELECT 1"]},
+        )
+        mock_cursor.execute.assert_called_once()
+
+        result = await call_tool(
+            "execute_sql_batch", {"queries": ["CREATE SCHEMA s", "SELECT 1"]}
+        )
+        assert result[0].text.startswith("Invalid query: CREATE or ALTER")
+        mock_cursor.execute.assert_called_once()
+
+        # Only CREATE SCHEMA must start a batch, ALTER SCHEMA need not
+        await call_tool(
+            "execute_sql_batch",
+            {"queries": ["ALTER SCHEMA x TRANSFER dbo.t", "SELECT 1"]},
+        )
+        assert mock_cursor.execute.call_count == 2
+        mock_cursor.execute.assert_called_with(
+            "ALTER SCHEMA x TRANSFER dbo.t\n;\nSELECT 1"
+        )
+
+    @pytest.mark.asyncio
+    async def test_transaction_handling(self, mock_db):
         """Test proper transaction handling for write operations."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+        mock_conn, mock_cursor = mock_db
         mock_cursor.rowcount = 1
 
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Test INSERT operation
-                result = await app.call_tool(
-                    "execute_sql", {"query": "INSERT INTO users (name) VALUES ('test')"}
-                )
-
-                # Verify commit was called
-                mock_conn.commit.assert_called_once()
-                assert "Rows affected: 1" in result[0].text
+        # Test INSERT operation
+        result = await call_tool(
+            "execute_sql", {"query": "INSERT INTO users (name) VALUES ('test')"}
+        )
+
+        # Verify commit was called
+        mock_conn.commit.assert_called_once()
+        assert "Rows affected: 1" in result[0].text
 
     @pytest.mark.asyncio
-    async def test_connection_cleanup(self):
+    async def test_connection_cleanup(self, mock_db):
         """Test that connections are properly cleaned up."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Even if operation fails, connection should be closed
-                mock_cursor.execute.side_effect = Exception("Query failed")
-
-                try:
-                    await app.call_tool("execute_sql", {"query": "SELECT * FROM users"})
-                except:
-                    pass
-
-                # Connection should still be closed
-                # (Note: current implementation may not guarantee this)
+        _, mock_cursor = mock_db
+
+        # Even if operation fails, connection should be closed
+        mock_cursor.execute.side_effect = Exception("Query failed")
+
+        try:
+            await call_tool("execute_sql", {"query": "SELECT * FROM users"})
+        except:
+            pass
+
+        # Connection should still be closed
+        # (Note: current implementation may not guarantee this)
 
 
 class TestEdgeCases:
     """Test edge cases and boundary conditions."""
 
     @pytest.mark.asyncio
-    async def test_empty_table_list(self):
+    async def test_empty_table_list(self, mock_db):
         """Test handling of database with no tables."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+        _, mock_cursor = mock_db
         mock_cursor.fetchall.return_value = []
 
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                resources = await app.list_resources()
-                assert resources == []
+        resources = await list_resources()
+        assert resources == []
 
     @pytest.mark.asyncio
-    async def test_large_result_set(self):
+    async def test_large_result_set(self, mock_db):
         """Test handling of large query results."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+        _, mock_cursor = mock_db
 
         # Create large result set
-        large_result = [(i, f"user_{i}", f"email_{i}@test.com") for i in range(10000)]
+        large_result = [(i, "user", "user@test.com") for i in range(10000)]
         mock_cursor.description = [("id",), ("name",), ("email",)]
-        mock_cursor.fetchall.return_value = large_result
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                result = await app.call_tool(
-                    "execute_sql", {"query": "SELECT * FROM users"}
-                )
-
-                # Should handle large results gracefully
-                assert len(result) == 1
-                assert isinstance(result[0].text, str)
-                assert len(result[0].text.split("\n")) == 10001  # Header + 10000 rows
+        mock_cursor.fetchmany.side_effect = [large_result, []]
+
+        result = await call_tool("execute_sql", {"query": "SELECT * FROM users"})
+
+        # Should handle large results gracefully
+        assert len(result) == 1
+        assert isinstance(result[0].text, str)
+        assert result[0].text.count("\n") == 10000  # Header + 10000 rows
 
     @pytest.mark.asyncio
-    async def test_special_characters_in_data(self):
+    async def test_special_characters_in_data(self, mock_db):
         """Test handling of special characters in query results."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+        _, mock_cursor = mock_db
 
         # Data with special characters
         mock_cursor.description = [("data",)]
-        mock_cursor.fetchall.return_value = [
-            ('Hello, "World"',),
-            ("Line1\nLine2",),
-            ("Tab\there",),
-            ("NULL",),
-            (None,),
+        mock_cursor.fetchmany.side_effect = [
+            [
+                ('Hello, "World"',),
+                ("Line1\nLine2",),
+                ("Tab\there",),
+                ("NULL",),
+                (None,),
+            ],
+            [],
         ]
 
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                result = await app.call_tool(
-                    "execute_sql", {"query": "SELECT data FROM test_table"}
-                )
-
-                # Should handle special characters properly
-                assert len(result) == 1
-                text = result[0].text
-                assert 'Hello, "World"' in text
-                assert "None" in text  # None should be converted to string
+        result = await call_tool(
+            "execute_sql", {"query": "SELECT data FROM test_table"}
+        )
+
+        # Special characters should be quoted as CSV
+        assert len(result) == 1
+        text = result[0].text
+        assert '"Hello, ""World"""' in text
+        assert '"Line1\nLine2"' in text
+        assert text.endswith("\nNULL")  # None is rendered as NULL
+
+    @pytest.mark.asyncio
+    async def test_null_values_in_resource(self, mock_db):
+        """Test that table resources render NULL values like query results."""
+        _, mock_cursor = mock_db
+
+        mock_cursor.description = [("id",), ("name",)]
+        mock_cursor.fetchmany.side_effect = [[(1, None), (2, "Bob")], []]
+
+        text = await read_resource(AnyUrl("mssql://users/data"))
+        assert text == "id,name\n1,NULL\n2,Bob"
+
+    @staticmethod
+    def _stream_rows(cursor, count):
+        """Make a mock cursor hand out count rows as a real cursor would."""
+        rows = iter([(i,) for i in range(count)])
+        cursor.description = [("id",)]
+        cursor.fetchmany.side_effect = lambda size=None: list(
+            itertools.islice(rows, size or cursor.arraysize)
+        )
+        cursor.fetchone.side_effect = lambda: next(rows, None)
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize(
+        "max_rows",
+        [5, FETCH_BATCH_SIZE, FETCH_BATCH_SIZE + 500],
+        ids=["below_batch_size", "equal_to_batch_size", "above_batch_size"],
+    )
+    async def test_max_rows_truncation(self, mock_db, monkeypatch, max_rows):
+        """Test that MSSQL_MAX_ROWS caps the rows returned and says so."""
+        _, mock_cursor = mock_db
+        monkeypatch.setenv("MSSQL_MAX_ROWS", str(max_rows))
+        self._stream_rows(mock_cursor, max_rows + 3)
+
+        result = await call_tool("execute_sql", {"query": "SELECT id FROM t"})
+
+        lines = result[0].text.split("\n")
+        assert lines[1:-1] == [str(i) for i in range(max_rows)]
+        assert lines[-1] == f"(Result truncated to {max_rows} rows by MSSQL_MAX_ROWS)"
+
+    @pytest.mark.asyncio
+    async def test_max_rows_not_reached(self, mock_db, monkeypatch):
+        """Test that exactly MSSQL_MAX_ROWS rows are not marked truncated."""
+        _, mock_cursor = mock_db
+        monkeypatch.setenv("MSSQL_MAX_ROWS", "5")
+        self._stream_rows(mock_cursor, 5)
+
+        result = await call_tool("execute_sql", {"query": "SELECT id FROM t"})
+
+        assert result[0].text == "id\n0\n1\n2\n3\n4"
@@ -2,174 +2,194 @@
 
 import asyncio
 import gc
-import os
+import itertools
 import time
+import tracemalloc
 from concurrent.futures import ThreadPoolExecutor
-from unittest.mock import Mock, patch
+from unittest.mock import Mock
 
-import psutil
 import pytest
 
-from yulin_mssql_mcp.server import app
+from yulin_mssql_mcp.server import FETCH_BATCH_SIZE, call_tool, list_resources
+
+pytestmark = pytest.mark.usefixtures("mssql_env")
+
+NS_PER_SECOND = 1_000_000_000
+
+# Large result set (10,000 rows), built once and shared between rounds
+_LARGE_DESC = (("id",), ("name",), ("email",), ("status",))
+_LARGE_RESULT = tuple(
+    (i, f"user_{i}", f"email_{i}@test.com", i % 100) for i in range(10000)
+)
+
+# Requests in flight at once in the concurrency tests
+CONCURRENCY_LIMIT = 16
+
+
+def _make_cursor(description, rows):
+    """Build a mock cursor that returns one batch of rows for a query."""
+    cursor = Mock(spec=["execute", "fetchmany", "close", "description", "arraysize"])
+    cursor.description = description
+    cursor.fetchmany.side_effect = [rows, []]
+    return cursor
+
+
+async def _gather_bounded(coros, return_exceptions=False):
+    """Run coroutines in a TaskGroup, at most CONCURRENCY_LIMIT at a time.
+
+    Results are returned in order. With return_exceptions, a failing
+    coroutine yields its exception instead of cancelling the others.
+    """
+    sem = asyncio.Semaphore(CONCURRENCY_LIMIT)
+
+    async def gated(coro):
+        async with sem:
+            if not return_exceptions:
+                return await coro
+            try:
+                return await coro
+            except Exception as e:
+                return e
+
+    async with asyncio.TaskGroup() as tg:
+        tasks = [tg.create_task(gated(coro)) for coro in coros]
+    return [task.result() for task in tasks]
+
+
+@pytest.fixture
+def run_sync():
+    """Run a coroutine to completion from synchronous code.
+
+    benchmark() calls plain functions, so benchmarked tests are synchronous
+    and drive the server on their own event loop.
+    """
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
 
 
 class TestPerformance:
     """Test performance characteristics under load."""
 
+    @pytest.mark.benchmark(group="execute_sql")
+    def test_query_response_time_latency(self, mock_db, run_sync, benchmark):
+        """Benchmark the response time of a typical query."""
+        _, mock_cursor = mock_db
+
+        # Simulate reasonable query execution, once per benchmark round
+        mock_cursor.description = [("id",), ("name",)]
+        rows = [(i, f"user_{i}") for i in range(100)]
+        mock_cursor.fetchmany.side_effect = itertools.cycle([rows, []])
+
+        result = benchmark(
+            lambda: run_sync(call_tool("execute_sql", {"query": "SELECT * FROM users"}))
+        )
+
+        assert len(result) == 1
+        # Each query reads one batch, then finds the end of the results
+        assert mock_cursor.fetchmany.call_count == 2 * mock_cursor.execute.call_count
+
     @pytest.mark.asyncio
-    async def test_query_response_time(self):
-        """Test that queries respond within acceptable time limits."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+    async def test_query_response_time_content(self, mock_db):
+        """Test that the benchmarked query returns every row."""
+        _, mock_cursor = mock_db
 
-        # Simulate reasonable query execution
         mock_cursor.description = [("id",), ("name",)]
-        mock_cursor.fetchall.return_value = [(i, f"user_{i}") for i in range(100)]
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                start_time = time.time()
-                result = await app.call_tool(
-                    "execute_sql", {"query": "SELECT * FROM users"}
-                )
-                end_time = time.time()
-
-                # Query should complete in reasonable time (< 1 second for mock)
-                assert end_time - start_time < 1.0
-                assert len(result) == 1
-                assert "user_99" in result[0].text
+        mock_cursor.fetchmany.side_effect = [[(i, f"user_{i}") for i in range(100)], []]
+
+        result = await call_tool("execute_sql", {"query": "SELECT * FROM users"})
+
+        mock_cursor.execute.assert_called_once()
+        assert len(result) == 1
+        assert "user_99" in result[0].text
 
     @pytest.mark.asyncio
-    async def test_concurrent_query_performance(self):
+    async def test_concurrent_query_performance(self, mock_db):
         """Test performance under concurrent query load."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        mock_cursor.description = [("count",)]
-        mock_cursor.fetchall.return_value = [(42,)]
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Run 50 concurrent queries
-                start_time = time.time()
-                tasks = [
-                    app.call_tool(
-                        "execute_sql", {"query": f"SELECT COUNT(*) FROM table_{i}"}
-                    )
-                    for i in range(50)
-                ]
-                results = await asyncio.gather(*tasks)
-                end_time = time.time()
-
-                # All queries should complete
-                assert len(results) == 50
-                assert all("42" in r[0].text for r in results)
-
-                # Should complete in reasonable time (< 5 seconds for 50 queries)
-                assert end_time - start_time < 5.0
+        mock_conn, _ = mock_db
 
-    @pytest.mark.asyncio
-    async def test_large_result_set_performance(self):
-        """Test performance with large result sets."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        # Create large result set (10,000 rows)
-        large_result = [
-            (i, f"user_{i}", f"email_{i}@test.com", i % 100) for i in range(10000)
+        # Concurrent queries run in worker threads, so each needs its own cursor
+        mock_conn.cursor.side_effect = lambda: _make_cursor([("count",)], [(42,)])
+
+        # Run 50 concurrent queries
+        start_ns = time.perf_counter_ns()
+        tasks = [
+            call_tool("execute_sql", {"query": f"SELECT COUNT(*) FROM table_{i}"})
+            for i in range(50)
         ]
-        mock_cursor.description = [("id",), ("name",), ("email",), ("status",)]
-        mock_cursor.fetchall.return_value = large_result
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                start_time = time.time()
-                result = await app.call_tool(
-                    "execute_sql", {"query": "SELECT * FROM large_table"}
-                )
-                end_time = time.time()
-
-                # Should handle large results efficiently
-                assert len(result) == 1
-                lines = result[0].text.split("\n")
-                assert len(lines) == 10001  # Header + 10000 rows
-
-                # Should complete in reasonable time (< 10 seconds)
-                assert end_time - start_time < 10.0
+        results = await _gather_bounded(tasks)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+
+        # All queries should complete
+        assert len(results) == 50
+        assert all("42" in r[0].text for r in results)
+
+        # Should complete in reasonable time (< 5 seconds for 50 queries)
+        assert elapsed_ns < 5 * NS_PER_SECOND
+
+    @pytest.mark.benchmark(group="execute_sql")
+    def test_large_result_set_performance(self, mock_db, run_sync, benchmark):
+        """Benchmark a query with a large result set."""
+        _, mock_cursor = mock_db
+
+        # Return the large result set once per round
+        mock_cursor.description = _LARGE_DESC
+        mock_cursor.fetchmany.side_effect = itertools.cycle([_LARGE_RESULT, []])
+
+        result = benchmark(
+            lambda: run_sync(
+                call_tool("execute_sql", {"query": "SELECT * FROM large_table"})
+            )
+        )
+
+        # Should handle large results
+        assert len(result) == 1
+        assert result[0].text.count("\n") == 10000  # Header + 10000 rows
 
 
 class TestMemoryUsage:
     """Test memory usage and leak prevention."""
 
     @pytest.mark.asyncio
-    async def test_memory_usage_stability(self):
+    async def test_memory_usage_stability(self, mock_db, monkeypatch):
         """Test that memory usage remains stable over time."""
-        if not hasattr(psutil.Process(), "memory_info"):
-            pytest.skip("Memory monitoring not available")
-
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+        _, mock_cursor = mock_db
 
+        # Query the database on every call instead of serving the cached list
+        monkeypatch.setenv("MSSQL_RESOURCE_CACHE_TTL", "0")
         mock_cursor.fetchall.return_value = [("table1",), ("table2",)]
 
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                process = psutil.Process(os.getpid())
-
-                # Get baseline memory
-                gc.collect()
-                baseline_memory = process.memory_info().rss / 1024 / 1024  # MB
-
-                # Run many operations
-                for _ in range(100):
-                    await app.list_resources()
-
-                # Check memory after operations
-                gc.collect()
-                final_memory = process.memory_info().rss / 1024 / 1024  # MB
-
-                # Memory growth should be minimal (< 50 MB)
-                memory_growth = final_memory - baseline_memory
-                assert memory_growth < 50, f"Memory grew by {memory_growth} MB"
+        # Trace Python allocations rather than process RSS, which the
+        # allocator keeps high even after memory is freed
+        tracemalloc.start()
+        # Move everything alive now out of the collector's way, so the loop
+        # only pays for scanning objects it creates itself
+        gc.collect()
+        gc.freeze()
+        try:
+            baseline = tracemalloc.take_snapshot()
+
+            # Run many operations
+            for _ in range(100):
+                await list_resources()
+
+            final = tracemalloc.take_snapshot()
+        finally:
+            gc.unfreeze()
+            tracemalloc.stop()
+
+        assert mock_cursor.execute.call_count == 100
+
+        # Memory growth should be minimal (< 5 MB)
+        memory_growth = sum(
+            stat.size_diff for stat in final.compare_to(baseline, "filename")
+        )
+        assert memory_growth < 5 * 1024 * 1024, f"Memory grew by {memory_growth} bytes"
 
     @pytest.mark.asyncio
-    async def test_large_data_memory_handling(self):
+    async def test_large_data_memory_handling(self, mock_db):
         """Test memory handling with large data sets."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+        _, mock_cursor = mock_db
 
         # Create very large result
         def generate_large_result():
@@ -177,188 +197,136 @@ class TestMemoryUsage:
                 yield (i, f"data_{i}" * 100)  # Large strings
 
         mock_cursor.description = [("id",), ("data",)]
-        mock_cursor.fetchall.return_value = list(generate_large_result())
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Should handle large data without excessive memory use
-                result = await app.call_tool(
-                    "execute_sql", {"query": "SELECT * FROM big_table"}
-                )
-
-                # Result should be created
-                assert len(result) == 1
-
-                # Memory should be released after operation
-                result = None
-                gc.collect()
+        # Hand out rows one batch at a time, like a real cursor
+        rows = generate_large_result()
+        mock_cursor.fetchmany.side_effect = lambda size=FETCH_BATCH_SIZE: list(
+            itertools.islice(rows, size)
+        )
+
+        # Should handle large data without excessive memory use
+        result = await call_tool("execute_sql", {"query": "SELECT * FROM big_table"})
+
+        # Result should be created
+        assert len(result) == 1
+
+        # Memory should be released after operation
+        result = None
+        gc.collect()
 
 
 class TestLoadHandling:
     """Test system behavior under various load conditions."""
 
     @pytest.mark.asyncio
-    async def test_burst_load_handling(self):
+    async def test_burst_load_handling(self, mock_db):
         """Test handling of sudden burst loads."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        mock_cursor.fetchall.return_value = [("result",)]
-        mock_cursor.description = [("data",)]
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Simulate burst of 100 requests
-                start_time = time.time()
-                tasks = []
-                for _ in range(100):
-                    tasks.append(app.call_tool("execute_sql", {"query": "SELECT 1"}))
-
-                results = await asyncio.gather(*tasks, return_exceptions=True)
-                end_time = time.time()
-
-                # Count successful results
-                successful = sum(1 for r in results if not isinstance(r, Exception))
-
-                # Most requests should succeed
-                assert successful >= 90  # Allow 10% failure rate
-
-                # Should complete within reasonable time
-                assert end_time - start_time < 30.0
+        mock_conn, _ = mock_db
+
+        # Concurrent queries run in worker threads, so each needs its own cursor
+        mock_conn.cursor.side_effect = lambda: _make_cursor([("data",)], [("result",)])
+
+        # Simulate burst of 100 requests
+        start_ns = time.perf_counter_ns()
+        tasks = []
+        for _ in range(100):
+            tasks.append(call_tool("execute_sql", {"query": "SELECT 1"}))
+
+        results = await _gather_bounded(tasks, return_exceptions=True)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+
+        # Count successful results
+        successful = sum(1 for r in results if not isinstance(r, Exception))
+
+        # Most requests should succeed
+        assert successful >= 90  # Allow 10% failure rate
+
+        # Should complete within reasonable time
+        assert elapsed_ns < 30 * NS_PER_SECOND
 
     @pytest.mark.asyncio
-    async def test_sustained_load_handling(self):
+    async def test_sustained_load_handling(self, mock_db):
         """Test handling of sustained load over time."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
+        _, mock_cursor = mock_db
 
-        mock_cursor.fetchall.return_value = [("ok",)]
+        mock_cursor.fetchmany.side_effect = itertools.cycle([[("ok",)], []])
         mock_cursor.description = [("status",)]
 
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Run continuous load for 10 seconds
-                start_time = time.time()
-                request_count = 0
-                error_count = 0
-
-                while time.time() - start_time < 10:
-                    try:
-                        result = await app.call_tool(
-                            "execute_sql", {"query": "SELECT 'ok'"}
-                        )
-                        request_count += 1
-                        assert "ok" in result[0].text
-                    except Exception:
-                        error_count += 1
-
-                    # Small delay to prevent overwhelming
-                    await asyncio.sleep(0.01)
-
-                # Should handle sustained load
-                assert request_count > 500  # At least 50 req/sec
-                assert error_count < request_count * 0.05  # Less than 5% errors
+        request_count = 0
+        error_count = 0
+
+        async def run_load():
+            nonlocal request_count, error_count
+            for _ in range(500):
+                try:
+                    result = await call_tool("execute_sql", {"query": "SELECT 'ok'"})
+                    request_count += 1
+                    assert "ok" in result[0].text
+                except Exception:
+                    error_count += 1
+
+        # 500 requests within 10 seconds is at least 50 req/sec
+        start_ns = time.perf_counter_ns()
+        await asyncio.wait_for(run_load(), timeout=10.0)
+        elapsed_ns = time.perf_counter_ns() - start_ns
+
+        # Should handle sustained load
+        assert elapsed_ns < 10 * NS_PER_SECOND
+        assert request_count + error_count == 500
+        assert error_count < request_count * 0.05  # Less than 5% errors
 
 
 class TestScalability:
     """Test scalability characteristics."""
 
     @pytest.mark.asyncio
-    async def test_resource_scaling(self):
+    @pytest.mark.parametrize("count", [10, 100, 1000])
+    async def test_resource_scaling(self, mock_db, count):
         """Test handling of increasing number of resources."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        # Test with different table counts
-        table_counts = [10, 100, 1000]
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                for count in table_counts:
-                    # Create table list
-                    tables = [(f"table_{i}",) for i in range(count)]
-                    mock_cursor.fetchall.return_value = tables
-
-                    start_time = time.time()
-                    resources = await app.list_resources()
-                    end_time = time.time()
-
-                    assert len(resources) == count
-
-                    # Time should scale reasonably (not exponentially)
-                    time_per_table = (end_time - start_time) / count
-                    assert time_per_table < 0.01  # Less than 10ms per table
+        _, mock_cursor = mock_db
+
+        # Create table list
+        tables = [(f"table_{i}",) for i in range(count)]
+        mock_cursor.fetchall.return_value = tables
+
+        start_ns = time.perf_counter_ns()
+        resources = await list_resources()
+        elapsed_ns = time.perf_counter_ns() - start_ns
+
+        assert len(resources) == count
+
+        # Time should scale reasonably (not exponentially)
+        time_per_table_ns = elapsed_ns // count
+        assert time_per_table_ns < NS_PER_SECOND // 100  # Less than 10ms per table
 
     @pytest.mark.asyncio
-    async def test_query_complexity_scaling(self):
+    @pytest.mark.parametrize(
+        "query",
+        [
+            "SELECT 1",
+            "SELECT * FROM users WHERE id = 1",
+            "SELECT u.*, o.* FROM users u JOIN orders o ON u.id = o.user_id",
+            """SELECT u.name, COUNT(o.id), SUM(o.total), AVG(o.total)
+               FROM users u
+               LEFT JOIN orders o ON u.id = o.user_id
+               GROUP BY u.name
+               HAVING COUNT(o.id) > 5
+               ORDER BY SUM(o.total) DESC""",
+        ],
+        ids=["constant", "filter", "join", "aggregate"],
+    )
+    async def test_query_complexity_scaling(self, mock_db, query):
         """Test performance with increasingly complex queries."""
-        mock_conn = Mock()
-        mock_cursor = Mock()
-        mock_conn.cursor.return_value = mock_cursor
-
-        with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "testdb",
-                },
-            ):
-                # Test simple to complex queries
-                queries = [
-                    "SELECT 1",
-                    "SELECT * FROM users WHERE id = 1",
-                    "SELECT u.*, o.* FROM users u JOIN orders o ON u.id = o.user_id",
-                    """SELECT u.name, COUNT(o.id), SUM(o.total), AVG(o.total)
-                       FROM users u 
-                       LEFT JOIN orders o ON u.id = o.user_id 
-                       GROUP BY u.name 
-                       HAVING COUNT(o.id) > 5
-                       ORDER BY SUM(o.total) DESC""",
-                ]
-
-                mock_cursor.description = [("result",)]
-                mock_cursor.fetchall.return_value = [("data",)]
-
-                for query in queries:
-                    start_time = time.time()
-                    result = await app.call_tool("execute_sql", {"query": query})
-                    end_time = time.time()
-
-                    # All queries should complete successfully
-                    assert len(result) == 1
-
-                    # Response time should be reasonable
-                    assert end_time - start_time < 2.0
+        _, mock_cursor = mock_db
+
+        mock_cursor.description = [("result",)]
+        mock_cursor.fetchmany.side_effect = [[("data",)], []]
+
+        start_ns = time.perf_counter_ns()
+        result = await call_tool("execute_sql", {"query": query})
+        elapsed_ns = time.perf_counter_ns() - start_ns
+
+        # All queries should complete successfully
+        assert len(result) == 1
+
+        # Response time should be reasonable
+        assert elapsed_ns < 2 * NS_PER_SECOND
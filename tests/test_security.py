@@ -9,27 +9,39 @@ from pydantic import AnyUrl
 from yulin_mssql_mcp.server import (call_tool, read_resource,
                                     validate_table_name)
 
+pytestmark = pytest.mark.usefixtures("mssql_env")
+
 
 class TestSQLInjectionPrevention:
     """Test SQL injection prevention measures."""
 
     @pytest.mark.asyncio
-    async def test_sql_injection_in_table_names(self):
+    @pytest.mark.parametrize(
+        "uri",
+        [
+            pytest.param(
+                AnyUrl("mssql://users/**/UNION/**/SELECT/**/password/data"),
+                id="union-select",
+            ),
+            pytest.param(AnyUrl("mssql://users%20OR%201=1/data"), id="encoded-or"),
+        ],
+    )
+    async def test_sql_injection_in_table_names(self, uri):
         """Test that SQL injection attempts in table names are blocked."""
-        malicious_uris = [
-            "mssql://users; DROP TABLE users--/data",
-            "mssql://users' OR '1'='1/data",
-            "mssql://users/**/UNION/**/SELECT/**/password/data",
-            "mssql://users%20OR%201=1/data",
-        ]
-
-        with patch.dict(
-            "os.environ",
-            {"MSSQL_USER": "test", "MSSQL_PASSWORD": "test", "MSSQL_DATABASE": "test"},
-        ):
-            for uri in malicious_uris:
-                with pytest.raises((ValueError, RuntimeError)):
-                    await read_resource(AnyUrl(uri))
+        with pytest.raises((ValueError, RuntimeError)):
+            await read_resource(uri)
+
+    @pytest.mark.parametrize(
+        "uri",
+        [
+            pytest.param("mssql://users; DROP TABLE users--/data", id="semicolon-drop"),
+            pytest.param("mssql://users' OR '1'='1/data", id="quote-or"),
+        ],
+    )
+    def test_sql_injection_uri_not_parsed(self, uri):
+        """Test that injection URIs with invalid host characters never form a URL."""
+        with pytest.raises(ValueError):
+            AnyUrl(uri)
 
     @pytest.mark.asyncio
     async def test_safe_query_execution(self):
@@ -40,25 +52,15 @@ class TestSQLInjectionPrevention:
         mock_conn.cursor.return_value = mock_cursor
 
         with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "test",
-                },
-            ):
-                # Test safe table read
-                uri = AnyUrl("mssql://users/data")
-                mock_cursor.description = [("id",), ("name",)]
-                mock_cursor.fetchall.return_value = [(1, "John"), (2, "Jane")]
-
-                result = await read_resource(uri)
-
-                # Verify the query was escaped properly
-                executed_query = mock_cursor.execute.call_args[0][0]
-                assert "[users]" in executed_query
-                assert "SELECT TOP 100 * FROM [users]" == executed_query
+            # Test safe table read
+            uri = AnyUrl("mssql://users/data")
+            mock_cursor.description = [("id",), ("name",)]
+            mock_cursor.fetchmany.side_effect = [[(1, "John"), (2, "Jane")], []]
+
+            result = await read_resource(uri)
+
+            # Verify the query was escaped properly
+            mock_cursor.execute.assert_called_once_with("SELECT TOP 100 * FROM [users]")
 
     def test_parameterized_queries(self):
         """Ensure queries use parameters where user input is involved."""
@@ -76,54 +78,68 @@ class TestSQLInjectionPrevention:
         mock_conn.cursor.return_value = mock_cursor
 
         with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "test",
-                },
-            ):
-                # Test that passwords or sensitive data aren't exposed in errors
-                mock_cursor.execute.side_effect = Exception(
-                    "Login failed for user 'sa' with password 'secret123'"
-                )
-
-                result = await call_tool(
-                    "execute_sql", {"query": "SELECT * FROM users"}
-                )
-
-                # Verify sensitive info is not in the error message
-                assert isinstance(result, list)
-                assert len(result) == 1
-                assert isinstance(result[0], TextContent)
-                assert "secret123" not in result[0].text
-                assert "Error executing query" in result[0].text
+            # Test that passwords or sensitive data aren't exposed in errors
+            mock_cursor.execute.side_effect = Exception(
+                "Login failed for user 'sa' with password 'secret123'"
+            )
+
+            result = await call_tool("execute_sql", {"query": "SELECT * FROM users"})
+
+            # Verify sensitive info is not in the error message
+            assert isinstance(result, list)
+            assert len(result) == 1
+            assert isinstance(result[0], TextContent)
+            assert "secret123" not in result[0].text
+            assert "Error executing query" in result[0].text
 
 
 class TestInputValidation:
     """Test input validation for all user inputs."""
 
     @pytest.mark.asyncio
-    async def test_tool_argument_validation(self):
-        """Test that tool arguments are properly validated."""
-        # Test with various invalid inputs
-        invalid_inputs = [
+    @pytest.mark.parametrize(
+        "invalid_input",
+        [
             {},  # Empty
             {"query": ""},  # Empty query
             {"query": None},  # None query
             {"query": {"$ne": None}},  # NoSQL injection attempt
+        ],
+        ids=["empty", "empty_query", "none_query", "nosql_injection"],
+    )
+    async def test_tool_argument_validation(self, invalid_input):
+        """Test that tool arguments are properly validated."""
+        with pytest.raises(ValueError):
+            await call_tool("execute_sql", invalid_input)
+
+    @pytest.mark.asyncio
+    async def test_malformed_query_rejected_locally(self):
+        """Test that malformed SQL is rejected without a database round-trip."""
+        malformed_queries = [
+            "SELECT * FROM users WHERE name = 'unterminated",
+            "SELECT * FROM [users",
+            "SELECT 1 /* unterminated comment",
+            "SELECT 1 /* outer /* nested */ still open",
+            "-- just a comment",
         ]
 
-        with patch.dict(
-            "os.environ",
-            {"MSSQL_USER": "test", "MSSQL_PASSWORD": "test", "MSSQL_DATABASE": "test"},
-        ):
-            for invalid_input in invalid_inputs:
-                with pytest.raises(ValueError):
-                    await call_tool("execute_sql", invalid_input)
+        with patch("pymssql.connect") as mock_connect:
+            for query in malformed_queries:
+                result = await call_tool("execute_sql", {"query": query})
+                assert result[0].text.startswith("Invalid query:")
+
+            mock_connect.assert_not_called()
 
-    def test_environment_variable_validation(self):
+    @pytest.mark.asyncio
+    async def test_nested_comment_accepted(self, mock_db):
+        """Test that nested block comments are skipped like SQL Server does."""
+        _, mock_cursor = mock_db
+        query = "SELECT 1 /* a /* b */ it's */"
+
+        await call_tool("execute_sql", {"query": query})
+        mock_cursor.execute.assert_called_once_with(query)
+
+    def test_environment_variable_validation(self, monkeypatch):
         """Test that environment variables are validated."""
         # Test with potentially dangerous environment values
         dangerous_values = {
@@ -132,10 +148,11 @@ class TestInputValidation:
             "MSSQL_USER": "admin'--",
         }
 
-        with patch.dict("os.environ", dangerous_values):
-            # The connection should fail safely without executing malicious code
-            # This tests that pymssql properly handles these values
-            pass
+        for name, value in dangerous_values.items():
+            monkeypatch.setenv(name, value)
+
+        # The connection should fail safely without executing malicious code
+        # This tests that pymssql properly handles these values
 
 
 class TestResourceAccessControl:
@@ -157,51 +174,37 @@ class TestResourceAccessControl:
         ]
 
         with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "test",
-                },
-            ):
-                from yulin_mssql_mcp.server import list_resources
-
-                resources = await list_resources()
-
-                # Verify system tables are filtered out (if implemented)
-                # Currently the query uses INFORMATION_SCHEMA which should only return user tables
-                resource_names = [r.name for r in resources]
-                assert len(resources) == 4  # All tables are returned currently
+            from yulin_mssql_mcp.server import list_resources
+
+            resources = await list_resources()
+
+            # Verify system tables are filtered out (if implemented)
+            # Currently the query uses INFORMATION_SCHEMA which should only return
+            # user tables
+            resource_names = [r.name for r in resources]
+            assert len(resources) == 4  # All tables are returned currently
 
     @pytest.mark.asyncio
-    async def test_query_permissions(self):
-        """Test that dangerous queries are handled safely."""
-        dangerous_queries = [
+    @pytest.mark.parametrize(
+        "query",
+        [
             "DROP TABLE users",
             "CREATE LOGIN hacker WITH PASSWORD = 'password'",
             "EXEC xp_cmdshell 'dir'",
             "ALTER SERVER ROLE sysadmin ADD MEMBER hacker",
-        ]
-
+        ],
+    )
+    async def test_query_permissions(self, query):
+        """Test that dangerous queries are handled safely."""
         mock_cursor = Mock()
         mock_conn = Mock()
         mock_conn.cursor.return_value = mock_cursor
 
         with patch("pymssql.connect", return_value=mock_conn):
-            with patch.dict(
-                "os.environ",
-                {
-                    "MSSQL_USER": "test",
-                    "MSSQL_PASSWORD": "test",
-                    "MSSQL_DATABASE": "test",
-                },
-            ):
-                for query in dangerous_queries:
-                    # The queries will be executed (current implementation doesn't block them)
-                    # but we ensure errors are handled gracefully
-                    mock_cursor.execute.side_effect = Exception("Permission denied")
-                    result = await call_tool("execute_sql", {"query": query})
-
-                    assert len(result) == 1
-                    assert "Error executing query" in result[0].text
+            # The query will be executed (current implementation doesn't block it)
+            # but we ensure errors are handled gracefully
+            mock_cursor.execute.side_effect = Exception("Permission denied")
+            result = await call_tool("execute_sql", {"query": query})
+
+            assert len(result) == 1
+            assert "Error executing query" in result[0].text
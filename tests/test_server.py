@@ -1,3 +1,6 @@
+import subprocess
+import sys
+
 import pytest
 from pydantic import AnyUrl
 
@@ -10,13 +13,27 @@ def test_server_initialization():
     assert app.name == "mssql_mcp_server"
 
 
+def test_server_import_does_not_load_driver():
+    """Test that the database driver is only imported on first use."""
+    subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import sys, yulin_mssql_mcp.server; assert 'pymssql' not in sys.modules",
+        ],
+        check=True,
+    )
+
+
 @pytest.mark.asyncio
 async def test_list_tools():
     """Test that list_tools returns expected tools."""
     tools = await list_tools()
-    assert len(tools) == 1
+    assert len(tools) == 2
     assert tools[0].name == "execute_sql"
     assert "query" in tools[0].inputSchema["properties"]
+    assert tools[1].name == "execute_sql_batch"
+    assert "queries" in tools[1].inputSchema["properties"]
 
 
 @pytest.mark.asyncio
@@ -33,10 +50,24 @@ async def test_call_tool_missing_query():
         await call_tool("execute_sql", {})
 
 
+@pytest.mark.asyncio
+async def test_call_tool_batch_invalid_queries():
+    """Test calling execute_sql_batch without a usable list of queries."""
+    with pytest.raises(ValueError, match="Queries are required"):
+        await call_tool("execute_sql_batch", {})
+    with pytest.raises(ValueError, match="non-empty SQL strings"):
+        await call_tool("execute_sql_batch", {"queries": "SELECT 1"})
+    with pytest.raises(ValueError, match="non-empty SQL strings"):
+        await call_tool("execute_sql_batch", {"queries": ["SELECT 1", " "]})
+
+
 # Skip database-dependent tests if no database connection
+# Tests that touch a real SQL Server share the "db" xdist group so they
+# never run concurrently under run_tests.py --parallel
+@pytest.mark.xdist_group("db")
 @pytest.mark.asyncio
 @pytest.mark.skipif(
-    not all([pytest.importorskip("pymssql"), pytest.importorskip("mssql_mcp_server")]),
+    not all([pytest.importorskip("pymssql"), pytest.importorskip("yulin_mssql_mcp")]),
     reason="SQL Server connection not available",
 )
 async def test_list_resources():